@@ -1,13 +1,46 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext
-import sounddevice as sd
-import numpy as np
+import importlib
 import random
 import time
-from pynput.mouse import Controller, Button
 import threading # For running the bot in a separate thread
 import math
-import traceback # For logging errors
+import heapq
+import itertools
+import wave
+import collections
+import argparse
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import signal
+import sys
+
+
+class _LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access.
+
+    Keeps `--help`, `--list-devices` and replay from paying for tkinter/pynput (or
+    numpy/sounddevice when unused). After the import the real module replaces the
+    stand-in in this module's globals, so hot paths pay nothing extra.
+    """
+    def __init__(self, module_name, global_name):
+        self._module_name = module_name
+        self._global_name = global_name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._module_name)
+        globals()[self._global_name] = module
+        return getattr(module, attr)
+
+
+np = _LazyModule("numpy", "np")
+sd = _LazyModule("sounddevice", "sd")
+tk = _LazyModule("tkinter", "tk")
+ttk = _LazyModule("tkinter.ttk", "ttk")
+scrolledtext = _LazyModule("tkinter.scrolledtext", "scrolledtext")
+mouse = _LazyModule("pynput.mouse", "mouse")
+sqlite3 = _LazyModule("sqlite3", "sqlite3")
 
 # --- Configuration (can be adjusted or later moved to GUI elements) ---
 # Audio Settings
@@ -15,9 +48,52 @@ SAMPLERATE = 44100
 CHANNELS = 1
 BLOCK_DURATION_MS = 50
 BLOCK_SIZE = int(SAMPLERATE * BLOCK_DURATION_MS / 1000)
+HOP_MS = None # e.g. 2.5: read the device in hops this long, each analysed with the last BLOCK_DURATION_MS (overlapping windows)
+
+# Decimating Front End
+DECIMATION = 1 # e.g. 4: low-pass and keep every 4th sample (44.1 kHz -> 11.025 kHz) before detection
+DECIMATION_TAPS_PER_PHASE = 16 # The FIR low-pass has DECIMATION * this many taps
+DECIMATION_CUTOFF = 0.9 # Pass band edge as a fraction of the decimated Nyquist frequency
+INPUT_DTYPE = "float32" # Device sample format, "float32" or "int16" (scaled inside the front end)
+
+# Low-Latency Mode (--low-latency)
+LOW_LATENCY_BLOCK_MS = 10 # Analysis window
+LOW_LATENCY_HOP_MS = 2.5 # Device block; a decision is made after every hop
+LOW_LATENCY_DETECTOR = "onset"
+
+# Audio Pipeline
+RING_BUFFER_BLOCKS = 64 # ~3.2s of audio at 50ms blocks before the callback starts dropping blocks
+CONSUMER_WAIT_S = 0.5 # Max time the detector thread sleeps before re-checking for shutdown
+ALIGN_BLOCKS = 2 # With several inputs, a batch waits for all of them unless one has this many blocks queued
+
+# Latency Instrumentation
+LATENCY_REPORT_PATH = "latency_report.json" # Written at session end and by the "Latency Report" button
+LATENCY_MAX_US = 60 * 1000 * 1000 # Histogram range; longer intervals are clamped
+LATENCY_SUB_BUCKET_BITS = 5 # 32 linear buckets per power of two, i.e. ~3% worst-case error
+
+# Detection
+DEFAULT_DETECTOR = "norm" # "norm" (cheapest), "band", "template", or the onset detectors "onset" and "flux"
+SPLASH_BAND_HZ = (300, 3000) # Where the bobber splash has most of its energy
+SPLASH_TEMPLATE_PATH = "splash_template.wav" # Recorded splash (.wav/.npy) used by the "template" detector
+
+# Splash Confirmation (hysteresis, minimum duration and refractory period, see SplashConfirmer)
+CONFIRM_MIN_S = 0.03 # A splash must stay above the release level this long after its first block (0 = one block is enough;
+                     # for the onset detectors it is their level, not the onset feature, that must stay up)
+CONFIRM_RELEASE_RATIO = 0.7 # Hysteresis: a splash lasts while the feature is above this fraction of the threshold
+CONFIRM_MEAN_RATIO = 1.0 # Envelope: the mean feature over the splash must reach this multiple of the threshold
+REFRACTORY_S = 1.0 # No new splash this soon after the last one
+
+# Auto-Calibration (threshold = noise floor + k * sigma of the detector feature)
+DEFAULT_AUTO_THRESHOLD = True
+CALIBRATION_K_SIGMA = 6.0
+CALIBRATION_MIN_RATIO = 1.5 # Threshold is at least this multiple of the noise floor
+CALIBRATION_MIN_THRESHOLD = 0.001 # Absolute lower bound, so a muted input cannot drive the threshold to 0
+CALIBRATION_TIME_CONSTANT_S = 10.0 # How quickly the noise floor follows changes in background noise
+CALIBRATION_WARMUP_S = 2.0 # Use the manual threshold until this much audio has been seen
+CALIBRATION_DISPLAY_MS = 500 # GUI refresh interval for the noise floor / threshold readout
 
 # Fishing Logic
-DEFAULT_SPLASH_THRESHOLD = 0.05 # CRITICAL: Needs calibration!
+DEFAULT_SPLASH_THRESHOLD = 0.05 # Manual threshold, also used while auto-calibration warms up
 CLICK_DELAY_BASE_MS = (120, 380)
 REACTION_TIME_VARIABILITY_FACTOR = 0.3
 OCCASIONAL_EXTREME_DELAY_CHANCE = 0.03
@@ -35,50 +111,2724 @@ MOUSE_LOOK_AROUND_CHANCE = 0.15
 MOUSE_LOOK_AROUND_DIST_PX = (30, 100)
 MOUSE_MOVE_STEPS = 10
 
+# Stream Supervision
+STREAM_WATCHDOG_INTERVAL_S = 1.0 # How often the worker checks that every input stream still delivers blocks
+STREAM_STALL_S = 2.0 # No block for this long counts as a lost stream
+STREAM_RETRY_S = (0.5, 30.0) # Reopen backoff: first delay, doubling up to the maximum
+
 # Session Management
 MAX_SESSION_DURATION_S = (1.5 * 60 * 60, 3 * 60 * 60) # Fish for 1.5 to 3 hours
+STATS_REPORT_INTERVAL_S = 10 * 60 # With several streams, log the per-stream stats this often
+ALLOW_SHARED_MOUSE = False # Live sessions all click the one system mouse, i.e. whichever game has focus
+
+# Status Log
+STATUS_BUFFER_MAX = 2000 # Pending status lines kept between GUI flushes; oldest are dropped beyond this
+STATUS_FLUSH_INTERVAL_MS = 100 # GUI drains pending status lines this often
+STATUS_FLUSH_BATCH = 500 # Max lines inserted into the widget per flush
+STATUS_MAX_LINES = 1000 # Status box keeps only the most recent lines
+STATUS_LOG_FILE = None # e.g. "status.log" to also write every status line to a rotating file
+ERROR_LOG_FILE = "error.log" # Tracebacks from the worker/detector threads
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+
+# Level Meter (GUI)
+METER_REFRESH_MS = 50 # GUI redraws the meter this often, however fast blocks arrive
+METER_POINT_S = 0.05 # One history point per this much audio (the loudest block in it)
+METER_HISTORY_S = 10.0 # Seconds of history drawn on the meter
+METER_WIDTH = 420
+METER_HEIGHT = 90
+
+# Metrics Store
+METRICS_DB_PATH = "fishing_metrics.db" # SQLite file collecting session events; None to disable
+METRICS_FLUSH_INTERVAL_S = 2.0 # Pending events are committed in one transaction this often
+METRICS_BUFFER_MAX = 100000 # Events kept while the writer catches up; oldest are dropped beyond this
+METRICS_CONFIG_IGNORED = ("device", "status_log_file", "latency_report_path", "metrics_db_path",
+                          "flight_recorder_path", "flight_snapshot_dir") # Don't split configs in the report
+
+# Flight Recorder
+FLIGHT_RECORDER_PATH = None # e.g. "flight_recorder.npy": keep the last FLIGHT_RECORDER_S of audio in a memory-mapped ring file
+FLIGHT_RECORDER_S = 120
+FLIGHT_SNAPSHOT_S = 30 # Audio saved per snapshot (a miss, or a false trigger flagged by the user)
+FLIGHT_SNAPSHOT_DIR = "snapshots"
+MISS_TIMEOUT_S = 45 # Rod in the water this long without a splash counts as a missed bite
+
+# Simulation (--simulate)
+SIM_BITE_DELAY_S = (5.0, 30.0) # A fish bites this long after the bobber lands (or after the last one got away)
+SIM_CATCH_WINDOW_S = 1.0 # Reeling in within this long after the splash catches the fish
+SIM_NOISE_LEVEL = 0.0003 # RMS of the background noise per sample
+SIM_SPLASH_LEVEL = 0.01 # RMS of a splash at its onset
+SIM_SPLASH_DECAY_S = 0.1
+SIM_REPORT_PREFIXES = ("ERROR", "[WARNING]", "[SESSION]", "[STATS]", "[LATENCY]") # Status lines worth printing
+
+# Offline Replay / Benchmark
+REPLAY_REFRACTORY_S = 1.0 # Blocks above threshold this close together count as one detection
+REPLAY_MATCH_WINDOW_S = (-0.1, 0.5) # Detection must land this close to a labeled splash to count
+
+# Settings a --config JSON file may override. Keys are the lower-case constant names
+# (without DEFAULT_); the constants above are only the defaults.
+SETTINGS_DEFAULTS = {
+    "device": None, # PortAudio input device index or name, None for the system default
+    "streams": None, # Several game instances: list of {"device", "channels", "name", "splash_threshold", "downmix"};
+                     # each channel is one instance, unless "downmix" averages them into one
+    "samplerate": SAMPLERATE,
+    "block_duration_ms": BLOCK_DURATION_MS,
+    "hop_ms": HOP_MS,
+    "decimation": DECIMATION,
+    "input_dtype": INPUT_DTYPE,
+    "ring_buffer_blocks": RING_BUFFER_BLOCKS,
+    "detector": DEFAULT_DETECTOR,
+    "splash_band_hz": SPLASH_BAND_HZ,
+    "splash_template_path": SPLASH_TEMPLATE_PATH,
+    "splash_threshold": DEFAULT_SPLASH_THRESHOLD,
+    "auto_threshold": DEFAULT_AUTO_THRESHOLD,
+    "confirm_min_s": CONFIRM_MIN_S,
+    "confirm_release_ratio": CONFIRM_RELEASE_RATIO,
+    "confirm_mean_ratio": CONFIRM_MEAN_RATIO,
+    "refractory_s": REFRACTORY_S,
+    "calibration_k_sigma": CALIBRATION_K_SIGMA,
+    "calibration_min_ratio": CALIBRATION_MIN_RATIO,
+    "calibration_min_threshold": CALIBRATION_MIN_THRESHOLD,
+    "calibration_time_constant_s": CALIBRATION_TIME_CONSTANT_S,
+    "calibration_warmup_s": CALIBRATION_WARMUP_S,
+    "click_delay_base_ms": CLICK_DELAY_BASE_MS,
+    "reaction_time_variability_factor": REACTION_TIME_VARIABILITY_FACTOR,
+    "occasional_extreme_delay_chance": OCCASIONAL_EXTREME_DELAY_CHANCE,
+    "extreme_delay_ms_range": EXTREME_DELAY_MS_RANGE,
+    "recast_delay_base_s": RECAST_DELAY_BASE_S,
+    "fumble_recast_chance": FUMBLE_RECAST_CHANCE,
+    "fumble_recast_extra_delay_s": FUMBLE_RECAST_EXTRA_DELAY_S,
+    "post_cast_cooldown_s": POST_CAST_COOLDOWN_S,
+    "skip_splash_chance": SKIP_SPLASH_CHANCE,
+    "mouse_wiggle_interval_s": MOUSE_WIGGLE_INTERVAL_S,
+    "mouse_wiggle_delta_px": MOUSE_WIGGLE_DELTA_PX,
+    "mouse_look_around_chance": MOUSE_LOOK_AROUND_CHANCE,
+    "mouse_look_around_dist_px": MOUSE_LOOK_AROUND_DIST_PX,
+    "mouse_move_steps": MOUSE_MOVE_STEPS,
+    "max_session_duration_s": MAX_SESSION_DURATION_S,
+    "allow_shared_mouse": ALLOW_SHARED_MOUSE, # Opt-in to several live sessions despite the shared mouse
+    "status_log_file": STATUS_LOG_FILE,
+    "metrics_db_path": METRICS_DB_PATH,
+    "flight_recorder_path": FLIGHT_RECORDER_PATH,
+    "flight_recorder_s": FLIGHT_RECORDER_S,
+    "flight_snapshot_s": FLIGHT_SNAPSHOT_S,
+    "flight_snapshot_dir": FLIGHT_SNAPSHOT_DIR,
+    "miss_timeout_s": MISS_TIMEOUT_S,
+    "latency_report_path": LATENCY_REPORT_PATH,
+}
+
+
+class Settings:
+    """Bot settings: SETTINGS_DEFAULTS overridden by keyword arguments or a JSON config file."""
+    def __init__(self, **overrides):
+        unknown = sorted(set(overrides) - set(SETTINGS_DEFAULTS))
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(unknown)}")
+        values = dict(SETTINGS_DEFAULTS)
+        values.update(overrides)
+        for key, value in values.items():
+            setattr(self, key, tuple(value) if isinstance(value, list) else value) # JSON has no tuples
+        self.hop_size # Checks decimation, input_dtype and the block/hop lengths on load, not mid-run
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def copy(self, **overrides):
+        values = self.as_dict()
+        values.update(overrides)
+        return Settings(**values)
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in SETTINGS_DEFAULTS}
+
+    @property
+    def block_size(self):
+        # Device frames per analysis block, a whole number of decimated samples
+        if not isinstance(self.decimation, int) or self.decimation < 1:
+            raise ValueError("decimation must be a positive integer.")
+        if self.input_dtype not in ("float32", "int16"):
+            raise ValueError("input_dtype must be 'float32' or 'int16'.")
+        block_size = int(self.samplerate * self.block_duration_ms / 1000) // self.decimation * self.decimation
+        if block_size < 1:
+            raise ValueError("block_duration_ms must span at least one (decimated) sample.")
+        return block_size
+
+    @property
+    def block_s(self):
+        return self.block_size / self.samplerate
+
+    @property
+    def hop_size(self):
+        """Frames per device block: the hop with overlapping windows, else the whole analysis block."""
+        if self.hop_ms is None:
+            return self.block_size
+        hop_size = int(self.samplerate * self.hop_ms / 1000) // self.decimation * self.decimation
+        if not 1 <= hop_size <= self.block_size:
+            raise ValueError(f"hop_ms must be between one sample and block_duration_ms ({self.block_duration_ms} ms).")
+        return hop_size
+
+    @property
+    def hop_s(self):
+        return self.hop_size / self.samplerate
+
+    @property
+    def detection_samplerate(self):
+        """Rate the detectors see, after the decimating front end."""
+        return self.samplerate / self.decimation
+
+    @property
+    def detection_block_size(self):
+        return self.block_size // self.decimation
+
+    @property
+    def detection_hop_size(self):
+        return self.hop_size // self.decimation
+
+    @property
+    def ring_capacity(self):
+        # ring_buffer_blocks is in analysis blocks, so smaller hops keep the same seconds of slack
+        return self.ring_buffer_blocks * -(-self.block_size // self.hop_size)
+
+
+
+class BlockRingBuffer:
+    """Preallocated single-producer/single-consumer ring of audio blocks.
+
+    The audio callback is the only writer and the detector thread the only reader.
+    Each side only advances its own counter, so no lock is needed around the data.
+    """
+    def __init__(self, capacity, block_size, channels, dtype='float32'):
+        self.capacity = capacity
+        self.block_size = block_size
+        self._blocks = np.zeros((capacity, block_size, channels), dtype=dtype)
+        self._frames = np.zeros(capacity, dtype=np.int64)
+        self._adc_times = np.zeros(capacity, dtype=np.float64) # time.monotonic() estimates, see DetectionPipeline
+        self._arrival_times = np.zeros(capacity, dtype=np.float64)
+        self._write_count = 0
+        self._read_count = 0
+        self.overflows = 0 # Blocks dropped because the consumer fell behind
+        self.input_overflows = 0 # Reported by PortAudio (device -> callback) for this input
+        self.input_underflows = 0
+        self.data_ready = threading.Event()
+
+    def last_arrival_time(self):
+        """Arrival time of the newest block, or None if nothing was pushed yet."""
+        count = self._write_count
+        return self._arrival_times[(count - 1) % self.capacity] if count else None
+
+    def __len__(self):
+        return self._write_count - self._read_count
+
+    def push(self, indata, frames, adc_time=0.0, arrival_time=0.0):
+        # Producer side. Never waits: if the ring is full the block is counted and dropped.
+        if self._write_count - self._read_count >= self.capacity:
+            self.overflows += 1
+            return False
+        slot = self._write_count % self.capacity
+        self._blocks[slot, :frames] = indata[:frames]
+        self._frames[slot] = frames
+        self._adc_times[slot] = adc_time
+        self._arrival_times[slot] = arrival_time
+        self._write_count += 1
+        self.data_ready.set()
+        return True
+
+    def peek(self):
+        # Consumer side. Returns a view of the oldest block, valid until release().
+        if self._read_count == self._write_count:
+            return None
+        slot = self._read_count % self.capacity
+        return self._blocks[slot, :self._frames[slot]]
+
+    def peek_times(self):
+        # (adc_time, arrival_time) of the block returned by peek()
+        slot = self._read_count % self.capacity
+        return self._adc_times[slot], self._arrival_times[slot]
+
+    def release(self):
+        self._read_count += 1
+
+
+class SlidingWindow:
+    """The last `size` frames of a stream, advanced one hop at a time without shifting.
+
+    Every frame is written twice, `size` rows apart, so the current window is
+    always one contiguous view of the buffer. A push costs O(hop), not O(size).
+    """
+    def __init__(self, size, channels=CHANNELS, dtype="float32"):
+        self.size = size
+        self._buffer = np.zeros((2 * size, channels), dtype=dtype)
+        self._pos = 0 # Next row to write; the window is [pos, pos + size)
+
+    def push(self, block):
+        """Append a block of at most `size` frames and return the updated window."""
+        size, pos = self.size, self._pos
+        frames = block.shape[0]
+        first = min(frames, size - pos)
+        self._buffer[pos:pos + first] = block[:first]
+        self._buffer[pos + size:pos + size + first] = block[:first]
+        rest = frames - first
+        if rest:
+            self._buffer[:rest] = block[first:]
+            self._buffer[size:size + rest] = block[first:]
+        self._pos = (pos + frames) % size
+        return self._buffer[self._pos:self._pos + size]
+
+
+class DecimatingFrontEnd:
+    """Polyphase low-pass/decimator for one input, with int16 scaling and downmixing folded in.
+
+    The windowed-sinc taps, the sample-format scale and the channel mix are
+    combined into one (taps * channels, lanes) weight matrix, so each kept output
+    sample is a single dot product over a strided view of the filter history;
+    the discarded samples are never computed. The raw block is copied once, into
+    that history, which also carries the filter state across blocks. Outputs are
+    scaled by sqrt(factor) so block norms, and thus thresholds, keep their units.
+    """
+    def __init__(self, block_size, channels=CHANNELS, factor=DECIMATION, dtype=INPUT_DTYPE, downmix=False,
+                 taps_per_phase=DECIMATION_TAPS_PER_PHASE, cutoff=DECIMATION_CUTOFF):
+        self.factor = factor
+        self.channels = channels
+        self.lanes = 1 if downmix else channels
+        self.output_size = block_size // factor
+        num_taps = factor * taps_per_phase if factor > 1 else 1
+        if factor > 1:
+            cutoff_cycles = cutoff / (2 * factor) # Cycles per input sample
+            n = np.arange(num_taps) - (num_taps - 1) / 2
+            taps = 2 * cutoff_cycles * np.sinc(2 * cutoff_cycles * n) * np.blackman(num_taps)
+            taps *= math.sqrt(factor) / taps.sum()
+        else:
+            taps = np.ones(1)
+        scale = 1.0 / 32768.0 if np.dtype(dtype) == np.int16 else 1.0
+        mix = np.full((channels, 1), 1.0 / channels) if downmix else np.eye(channels)
+        weights = taps[::-1, np.newaxis, np.newaxis] * mix[np.newaxis] * scale # (taps, channels, lanes), oldest tap first
+        self.num_taps = num_taps
+        self._weights = np.ascontiguousarray(weights.reshape(num_taps * channels, self.lanes), dtype=np.float32)
+        self._history = np.zeros((num_taps - 1 + factor - 1 + block_size, channels), dtype=np.float32)
+        self._fill = num_taps - 1 # Rows of history before the next block; starts as silence
+        self._out = np.zeros((block_size // factor + 1, self.lanes), dtype=np.float32)
+        self.blocks = 0
+        self.cpu_time_s = 0.0
+
+    def process(self, block, out):
+        """Filter `block` (frames, channels) into `out` (output_size, lanes). Returns the number of outputs."""
+        start = time.thread_time()
+        history, factor, num_taps = self._history, self.factor, self.num_taps
+        total = self._fill + block.shape[0]
+        history[self._fill:total] = block # The one copy, converting int16 on the way
+        count = (total - num_taps) // factor + 1
+        windows = np.lib.stride_tricks.as_strided(
+            history, shape=(count, num_taps * self.channels),
+            strides=(factor * history.strides[0], history.strides[1]))
+        np.dot(windows, self._weights, out=self._out[:count])
+        out[:count] = self._out[:count]
+        out[count:] = 0.0
+        consumed = count * factor
+        history[:total - consumed] = history[consumed:total] # Keep the taps' worth of state
+        self._fill = total - consumed
+        self.cpu_time_s += time.thread_time() - start
+        self.blocks += 1
+        return count
+
+    def cost_per_block_us(self):
+        return self.cpu_time_s / self.blocks * 1e6 if self.blocks else 0.0
+
+
+def make_front_end(settings, channels=CHANNELS, downmix=False):
+    """The front end one input needs, or None when its blocks can go to the detector as they are."""
+    if settings.decimation == 1 and np.dtype(settings.input_dtype) == np.float32 and not downmix:
+        return None
+    return DecimatingFrontEnd(settings.hop_size, channels, settings.decimation, settings.input_dtype, downmix)
+
+
+class DetectionPipeline:
+    """Moves audio blocks from the PortAudio callbacks to a dedicated detector thread.
+
+    Each input stream (`channels` as a list) has its own ring buffer and `input_callback`;
+    the consumer lays their lanes side by side and calls `on_block(block, ready)` once per batch.
+    """
+    def __init__(self, on_block, on_error=None, block_size=BLOCK_SIZE, channels=CHANNELS,
+                 capacity=RING_BUFFER_BLOCKS, latency=None, clock=None, dtype='float32', front_ends=None,
+                 align_blocks=ALIGN_BLOCKS):
+        self.clock = clock or SYSTEM_CLOCK
+        self.align_blocks = align_blocks
+        input_channels = list(channels) if isinstance(channels, (list, tuple)) else [channels]
+        self.rings = [BlockRingBuffer(capacity, block_size, ch, dtype) for ch in input_channels]
+        self.front_ends = list(front_ends) if front_ends else [None] * len(self.rings)
+        input_lanes = [fe.lanes if fe else ch for fe, ch in zip(self.front_ends, input_channels)]
+        self.data_ready = threading.Event() # Shared by all inputs, so one wait covers them all
+        for ring in self.rings:
+            ring.data_ready = self.data_ready
+        self.lanes = sum(input_lanes)
+        self.input_lanes = [] # Slice of the batch's lanes belonging to each input
+        for count in input_lanes:
+            start = self.input_lanes[-1].stop if self.input_lanes else 0
+            self.input_lanes.append(slice(start, start + count))
+        frames = next((fe.output_size for fe in self.front_ends if fe), block_size)
+        gather = len(self.rings) > 1 or any(self.front_ends)
+        self._batch = np.zeros((frames, self.lanes), dtype=np.float32) if gather else None
+        self._ready = np.ones(self.lanes, dtype=bool)
+        self.on_block = on_block
+        self.on_error = on_error
+        self.blocks_processed = 0
+        self.latency = latency
+        self.input_adc_times = [0.0] * len(self.rings)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def input_overflows(self):
+        return sum(ring.input_overflows for ring in self.rings)
+
+    @property
+    def input_underflows(self):
+        return sum(ring.input_underflows for ring in self.rings)
+
+    @property
+    def dropped(self):
+        return sum(ring.overflows for ring in self.rings)
+
+    def input_callback(self, index):
+        """PortAudio callback feeding input `index`."""
+        ring = self.rings[index]
+        def callback(indata, frames, time_info, status):
+            self._push(ring, indata, frames, time_info, status)
+        return callback
+
+    def _push(self, ring, indata, frames, time_info, status):
+        # Runs on the audio thread: bump counters, copy the block, return.
+        arrival_time = self.clock.monotonic()
+        adc_time = arrival_time
+        if time_info is not None and time_info.inputBufferAdcTime > 0:
+            # PortAudio reports stream-clock times; only their difference carries over to monotonic
+            adc_time -= max(0.0, time_info.currentTime - time_info.inputBufferAdcTime)
+        if status:
+            if status.input_overflow:
+                ring.input_overflows += 1
+            if status.input_underflow:
+                ring.input_underflows += 1
+        ring.push(indata, frames, adc_time, arrival_time)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self.data_ready.set() # Wake the consumer so it notices the stop
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def pending(self):
+        return sum(len(ring) for ring in self.rings)
+
+    def process_pending(self):
+        """Run `on_block` on every batch that is complete (or overdue). Returns the number of input blocks processed."""
+        if self._batch is None:
+            return self._process_single()
+        processed = 0
+        while True:
+            queued = [len(ring) for ring in self.rings]
+            if min(queued) == 0 and max(queued) < self.align_blocks:
+                break # Wait for the other inputs' blocks, so one batch covers every stream
+            gathered = 0
+            for index, ring in enumerate(self.rings):
+                lanes = self.input_lanes[index]
+                block = ring.peek()
+                self._ready[lanes] = block is not None
+                if block is None:
+                    self._batch[:, lanes] = 0.0 # Not its previous block again
+                    continue
+                front_end = self.front_ends[index]
+                if front_end is not None:
+                    front_end.process(block, self._batch[:, lanes])
+                else:
+                    frames = block.shape[0]
+                    self._batch[:frames, lanes] = block
+                    self._batch[frames:, lanes] = 0.0
+                self._record_times(index, ring)
+                ring.release() # Copied into the batch, so the slot can be reused right away
+                gathered += 1
+            self.on_block(self._batch, self._ready)
+            processed += gathered
+        self.blocks_processed += processed
+        return processed
+
+    def _process_single(self):
+        # One input: hand the ring slot itself to the detector, no gather copy.
+        ring = self.rings[0]
+        processed = 0
+        block = ring.peek()
+        while block is not None:
+            self._record_times(0, ring)
+            self.on_block(block, self._ready)
+            ring.release()
+            processed += 1
+            block = ring.peek()
+        self.blocks_processed += processed
+        return processed
+
+    def _record_times(self, index, ring):
+        adc_time, arrival_time = ring.peek_times()
+        self.input_adc_times[index] = adc_time
+        if self.latency is not None:
+            self.latency.record("buffering", arrival_time - adc_time)
+            self.latency.record("queue", self.clock.monotonic() - arrival_time)
+
+    def stats_summary(self):
+        return (f"blocks={self.blocks_processed} dropped={self.dropped} "
+                f"input_overflows={self.input_overflows} input_underflows={self.input_underflows}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.data_ready.wait(CONSUMER_WAIT_S)
+            self.data_ready.clear()
+            try:
+                self.process_pending()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+                return
 
-class FishingBotGUI:
-    def __init__(self, root_window):
-        self.root = root_window
-        self.root.title("🎣 Minecraft Auto-Fisher")
-        self.root.geometry("450x400") # Adjusted size
 
-        self.mouse_controller = Controller()
-        self.fishing_thread = None
-        self.stop_event = threading.Event()
+class SystemClock:
+    """The real clock. Live sessions use this; simulations swap in a VirtualClock."""
+    def monotonic(self):
+        return time.monotonic()
+
+    def wait(self, condition, timeout):
+        condition.wait(timeout)
+
+
+class VirtualClock(SystemClock):
+    """Simulated time: waiting for a deadline jumps straight to it instead of sleeping."""
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, condition, timeout):
+        if timeout is None:
+            condition.wait() # Nothing scheduled: only a stop can wake us
+        else:
+            self.now += timeout
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class ActionScheduler:
+    """Timer heap that runs callables at `clock.monotonic()` deadlines on one thread.
+
+    `run` sleeps exactly until the earliest deadline; `call_at` from another thread
+    (e.g. a detected splash) and `stop` wake it immediately.
+    """
+    def __init__(self, clock=None):
+        self.clock = clock or SYSTEM_CLOCK
+        self.events_run = 0
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count() # Tie-breaker so equal deadlines keep FIFO order
+        self._stopped = False
+
+    def call_at(self, deadline, fn, *args):
+        entry = [deadline, next(self._seq), fn, args]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+        return entry
+
+    def call_later(self, delay_s, fn, *args):
+        return self.call_at(self.clock.monotonic() + delay_s, fn, *args)
+
+    def call_soon(self, fn, *args):
+        return self.call_at(self.clock.monotonic(), fn, *args)
+
+    def cancel(self, entry):
+        entry[2] = None # Lazily skipped when it reaches the top of the heap
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = self.clock.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self.clock.wait(self._cond, self._heap[0][0] - now if self._heap else None)
+                if self._stopped:
+                    return
+                _, _, fn, args = heapq.heappop(self._heap)
+            if fn is not None:
+                self.events_run += 1
+                fn(*args)
+
+
+def get_file_logger(name, path, max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUP_COUNT):
+    """Logger writing to a size-capped rotating file (created on first write)."""
+    import logging.handlers # Deferred: only needed once something is actually logged to a file
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       delay=True, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def log_error(message, exc):
+    get_file_logger("afish.errors", ERROR_LOG_FILE).error(message, exc_info=(type(exc), exc, exc.__traceback__))
+
+
+class StatusLog:
+    """Bounded buffer of status lines: any thread pushes, one consumer drains in batches.
+
+    deque append/popleft are atomic, so producers never wait on the GUI. When the
+    consumer falls behind, the oldest pending lines are dropped and counted.
+    """
+    def __init__(self, capacity=STATUS_BUFFER_MAX, file_path=STATUS_LOG_FILE):
+        self._pending = collections.deque(maxlen=capacity)
+        self.pushed = 0
+        self.drained = 0
+        self._file_logger = get_file_logger("afish.status", file_path) if file_path else None
+
+    @property
+    def dropped(self):
+        return max(0, self.pushed - self.drained - len(self._pending))
+
+    def push(self, message):
+        self._pending.append(message)
+        self.pushed += 1
+
+    def drain(self, max_items=STATUS_FLUSH_BATCH):
+        batch = []
+        while len(batch) < max_items:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+        self.drained += len(batch)
+        if self._file_logger:
+            for message in batch:
+                self._file_logger.info(message)
+        return batch
+
+
+class LevelMeter:
+    """Per-lane peak/RMS/feature history shared between the detector thread and the GUI.
+
+    The detector thread folds every block into running maxima (O(lanes) work,
+    no allocation) and commits one history point per `point_s` of audio, so the
+    history rate is fixed whatever the hop size. The GUI copies the history on
+    its own timer. Nothing here is locked: a point read mid-write is at worst a
+    stale value on a display. `level_scale` undoes any gain applied before the
+    meter (the decimating front end's sqrt(factor)), so peak/RMS stay in dBFS.
+    """
+    def __init__(self, lanes, block_s, point_s=METER_POINT_S, history_s=METER_HISTORY_S, level_scale=1.0):
+        self.lanes = lanes
+        self.level_scale = level_scale
+        self.blocks_per_point = max(1, int(round(point_s / block_s)))
+        self.points = max(2, int(round(history_s / (self.blocks_per_point * block_s))))
+        self.peak = np.zeros((self.points, lanes)) # Ring of history points, oldest at `count % points`
+        self.rms = np.zeros((self.points, lanes))
+        self.feature = np.zeros((self.points, lanes))
+        self.threshold = np.zeros((self.points, lanes))
+        self.count = 0 # History points committed
+        self._blocks = 0 # Blocks folded into the pending point
+        self._peak = np.zeros(lanes)
+        self._rms = np.zeros(lanes)
+        self._feature = np.zeros(lanes)
+        self._block_peak = np.zeros(lanes, dtype=np.float32)
+        self._block_rms = np.zeros(lanes, dtype=np.float32)
+        self._scratch = None
+
+    def update(self, block, features, thresholds):
+        # Detector thread, once per block.
+        if self._scratch is None or self._scratch.shape != block.shape:
+            self._scratch = np.zeros(block.shape, dtype=np.float32) # Only when the block shape changes
+        np.abs(block, out=self._scratch)
+        np.max(self._scratch, axis=0, out=self._block_peak)
+        np.square(block, out=self._scratch)
+        np.mean(self._scratch, axis=0, out=self._block_rms)
+        np.sqrt(self._block_rms, out=self._block_rms)
+        if self.level_scale != 1.0:
+            np.multiply(self._block_peak, self.level_scale, out=self._block_peak)
+            np.multiply(self._block_rms, self.level_scale, out=self._block_rms)
+        if self._blocks == 0:
+            self._peak[:] = self._block_peak
+            self._rms[:] = self._block_rms
+            self._feature[:] = features
+        else:
+            np.maximum(self._peak, self._block_peak, out=self._peak)
+            np.maximum(self._rms, self._block_rms, out=self._rms)
+            np.maximum(self._feature, features, out=self._feature)
+        self._blocks += 1
+        if self._blocks < self.blocks_per_point:
+            return
+        slot = self.count % self.points
+        self.peak[slot] = self._peak
+        self.rms[slot] = self._rms
+        self.feature[slot] = self._feature
+        self.threshold[slot] = thresholds
+        self.count += 1
+        self._blocks = 0
+
+    def history(self, lane=0):
+        """GUI thread: (peak, rms, feature, threshold) arrays for `lane`, oldest point first."""
+        count = self.count
+        order = np.arange(count - min(count, self.points), count) % self.points
+        return (self.peak[order, lane], self.rms[order, lane],
+                self.feature[order, lane], self.threshold[order, lane])
+
+
+METRICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started TEXT,       -- Local wall-clock time
+    mode TEXT,          -- "live" or "simulated"
+    detector TEXT,
+    config TEXT,        -- Settings as JSON
+    config_hash TEXT,   -- Groups sessions with the same behaviour-relevant settings
+    duration_s REAL     -- Set when the session ends
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER REFERENCES sessions(id),
+    t REAL,             -- Seconds since the session started
+    kind TEXT,          -- cast, detection, skip, reel, miss, false_trigger, warning, error, reconnect
+    lane INTEGER,
+    value REAL,         -- Detector feature, or seconds of audio lost for a reconnect
+    threshold REAL,
+    latency_s REAL,     -- detection: ADC -> decision, reel: ADC -> click
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_session_kind ON events (session_id, kind);
+"""
+
+
+def config_hash(config):
+    relevant = {key: value for key, value in config.items() if key not in METRICS_CONFIG_IGNORED}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:8]
+
+
+class MetricsWriter:
+    """Buffered writer of one session's events into the SQLite metrics store.
+
+    `record` only appends to a deque, so any thread may call it without waiting
+    on the disk; a writer thread commits pending events in one transaction every
+    `flush_interval_s`. The audio callback never records anything.
+    """
+    def __init__(self, path, settings, mode="live", clock=None, flush_interval_s=METRICS_FLUSH_INTERVAL_S,
+                 capacity=METRICS_BUFFER_MAX):
+        self.path = path
+        self.clock = clock or SYSTEM_CLOCK
+        self.start_time = self.clock.monotonic()
+        self.flush_interval_s = flush_interval_s
+        config = settings.as_dict()
+        self._session_row = (time.strftime("%Y-%m-%d %H:%M:%S"), mode, settings.detector,
+                             json.dumps(config), config_hash(config))
+        self._pending = collections.deque(maxlen=capacity)
+        self.recorded = 0
+        self.written = 0
+        self.session_id = None
+        self.duration_s = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+
+    def record(self, kind, lane=None, value=None, threshold=None, latency_s=None, detail=None):
+        self._pending.append((self.clock.monotonic() - self.start_time, kind, lane,
+                              None if value is None else float(value),
+                              None if threshold is None else float(threshold), latency_s, detail))
+        self.recorded += 1
+
+    def close(self, duration_s, timeout=5.0):
+        self.duration_s = duration_s
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        connection = None
+        try:
+            connection = sqlite3.connect(self.path)
+            connection.executescript(METRICS_SCHEMA)
+            with connection:
+                self.session_id = connection.execute(
+                    "INSERT INTO sessions (started, mode, detector, config, config_hash) VALUES (?, ?, ?, ?, ?)",
+                    self._session_row).lastrowid
+            while not self._stop_event.wait(self.flush_interval_s):
+                self._flush(connection)
+            self._flush(connection)
+            with connection:
+                connection.execute("UPDATE sessions SET duration_s = ? WHERE id = ?", (self.duration_s, self.session_id))
+        except sqlite3.Error as e:
+            log_error(f"Metrics store {self.path} failed", e)
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _flush(self, connection):
+        batch = []
+        while True:
+            try:
+                batch.append((self.session_id,) + self._pending.popleft())
+            except IndexError:
+                break
+        if batch:
+            with connection: # One transaction per batch
+                connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            self.written += len(batch)
+
+
+class LatencyHistogram:
+    """Fixed-size log-linear (HDR-style) histogram of durations, stored in microseconds.
+
+    Each power-of-two range is split into 2**sub_bucket_bits linear buckets, so the
+    relative error is bounded no matter the magnitude and recording is O(1).
+    """
+    def __init__(self, max_value_us=LATENCY_MAX_US, sub_bucket_bits=LATENCY_SUB_BUCKET_BITS):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.max_value_us = int(max_value_us)
+        self.counts = np.zeros(self._index(self.max_value_us) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index(self, value_us):
+        if value_us < self.sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bucket_bits - 1
+        return (shift + 1) * self.sub_bucket_count + (value_us >> shift) - self.sub_bucket_count
+
+    def _bucket_midpoint(self, index):
+        if index < self.sub_bucket_count:
+            return float(index)
+        shift = index // self.sub_bucket_count - 1
+        low = (index % self.sub_bucket_count + self.sub_bucket_count) << shift
+        return low + ((1 << shift) - 1) / 2.0
+
+    def record(self, seconds):
+        value_us = min(self.max_value_us, max(0, int(seconds * 1e6)))
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+
+    def percentile_us(self, percentile):
+        if not self.total:
+            return 0.0
+        rank = max(1, int(math.ceil(percentile / 100.0 * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._bucket_midpoint(index), float(self.max_us))
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """Dict of count/min/mean/percentiles/max in milliseconds."""
+        result = {"count": self.total}
+        if self.total:
+            result["min_ms"] = self.min_us / 1000.0
+            result["mean_ms"] = self.sum_us / self.total / 1000.0
+            for p in percentiles:
+                result[f"p{p}_ms"] = self.percentile_us(p) / 1000.0
+            result["max_ms"] = self.max_us / 1000.0
+        return result
+
+
+class LatencyRecorder:
+    """One LatencyHistogram per pipeline stage, in the order stages were first recorded.
+
+    Stages used by the bot:
+      buffering      device ADC time -> callback entry (PortAudio/driver buffering)
+      queue          callback entry -> detector thread picks the block up
+      detector       detector thread pick-up -> detection decision
+      confirmation   first block of a splash -> the block that confirmed it (SplashConfirmer)
+      detection      device ADC time of the splash's first block -> detection decision
+      reaction_delay decision -> scheduled reel click (intentional, humanized)
+      click_jitter   scheduled -> actual reel click
+      cast_jitter    scheduled -> actual cast click
+      end_to_end     device ADC time -> actual reel click
+    """
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def summary_lines(self):
+        lines = []
+        for stage, histogram in list(self.stages.items()): # May be called while other threads record
+            summary = histogram.summary()
+            if not summary["count"]:
+                continue
+            lines.append(f"{stage:>14}: n={summary['count']} mean={summary['mean_ms']:.2f} "
+                         f"p50={summary['p50_ms']:.2f} p99={summary['p99_ms']:.2f} "
+                         f"max={summary['max_ms']:.2f} ms")
+        return lines
+
+    def export(self, path=LATENCY_REPORT_PATH):
+        report = {stage: histogram.summary() for stage, histogram in list(self.stages.items())}
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+def load_audio_file(path, samplerate=SAMPLERATE):
+    """Load a .wav or .npy recording as float32 samples shaped (frames, channels)."""
+    if str(path).lower().endswith(".npy"):
+        samples = np.load(path).astype(np.float32, copy=False)
+    else:
+        with wave.open(str(path), "rb") as wav:
+            if wav.getframerate() != samplerate:
+                raise ValueError(f"{path} is {wav.getframerate()} Hz, expected {samplerate} Hz.")
+            width = wav.getsampwidth()
+            raw = wav.readframes(wav.getnframes())
+            channels = wav.getnchannels()
+        if width == 1:
+            samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        elif width == 2:
+            samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+        elif width == 4:
+            samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+        else:
+            raise ValueError(f"{path}: unsupported sample width of {width} bytes.")
+        samples = samples.reshape(-1, channels)
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    return samples
+
+
+def audio_file_samplerate(path):
+    """Sample rate stored in a .wav file, or None for .npy (which has none)."""
+    if str(path).lower().endswith(".npy"):
+        return None
+    with wave.open(str(path), "rb") as wav:
+        return wav.getframerate()
+
+
+def save_audio_file(path, samples, samplerate=SAMPLERATE):
+    """Write float samples shaped (frames, channels) as 16-bit PCM .wav, or as float32 .npy."""
+    if str(path).lower().endswith(".npy"):
+        np.save(path, samples.astype(np.float32, copy=False))
+        return path
+    pcm = (np.clip(samples, -1.0, 32767 / 32768.0) * 32768.0).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(pcm.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(samplerate)
+        wav.writeframes(pcm.tobytes())
+    return path
+
+
+# Per-lane decisions stored with each flight recorder block
+DECISION_IDLE = 0 # Not listening: rod out of the water, in cooldown or a reel already pending
+DECISION_LISTEN = 1 # Listening, feature below threshold
+DECISION_REEL = 2 # Splash detected, reel-in scheduled
+DECISION_SKIP = 3 # Splash detected, deliberately skipped
+DECISION_ARMED = 4 # Listening, feature above threshold but the splash is not confirmed yet
+TRACE_FIELDS = ("seq", "adc_time", "feature", "threshold", "decision") # Everything but the audio
+
+
+class FlightRecorder:
+    """Keeps the last `seconds` of audio, features and decisions in a memory-mapped ring file.
+
+    The file is a .npy array of records (seq, adc_time, feature, threshold,
+    decision, audio), so it can be opened with `np.load(path, mmap_mode="r")`
+    even after a crash; `seq` orders the slots and is 0 for unused ones. Blocks
+    are copied straight from the pipeline's ring buffer into the mapping on the
+    detector thread, never in the audio callback, and the OS writes the pages
+    back in the background. `snapshot` copies the most recent blocks out and
+    saves them as `<name>.wav` plus `<name>.trace.npy` on a separate thread.
+    """
+    def __init__(self, path, block_size=BLOCK_SIZE, lanes=CHANNELS, samplerate=SAMPLERATE,
+                 seconds=FLIGHT_RECORDER_S):
+        self.path = path
+        self.block_size = block_size
+        self.samplerate = samplerate
+        self.capacity = max(1, int(math.ceil(seconds * samplerate / block_size)))
+        self.dtype = np.dtype([("seq", "<i8"), ("adc_time", "<f8"),
+                               ("feature", "<f4", (lanes,)), ("threshold", "<f4", (lanes,)),
+                               ("decision", "i1", (lanes,)), ("audio", "<f4", (block_size, lanes))])
+        self._records = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(self.capacity,))
+        self.write_count = 0
+        self._writers = []
+
+    def record(self, block, features, thresholds, decisions, adc_time):
+        slot = self._records[self.write_count % self.capacity]
+        frames = block.shape[0]
+        slot["audio"][:frames] = block # Single copy, ring buffer slot -> mapped page
+        slot["audio"][frames:] = 0.0
+        slot["feature"] = features
+        slot["threshold"] = thresholds
+        slot["decision"] = decisions
+        slot["adc_time"] = adc_time
+        self.write_count += 1
+        slot["seq"] = self.write_count # Written last: a non-zero seq marks a complete slot
+
+    def recent(self, seconds):
+        """Copy of the last `seconds` of records, oldest first."""
+        count = min(self.write_count, self.capacity, int(math.ceil(seconds * self.samplerate / self.block_size)))
+        end = self.write_count % self.capacity
+        indices = np.arange(end - count, end) % self.capacity
+        return self._records[indices] # Fancy indexing copies out of the mapping
+
+    def snapshot(self, base_path, seconds=FLIGHT_SNAPSHOT_S, lane=None):
+        """Save the last `seconds` of every lane, or of `lane` only, in the background.
+
+        Returns the .wav path, or None if nothing is recorded.
+        """
+        records = self.recent(seconds)
+        if not len(records):
+            return None
+        lanes = slice(None) if lane is None else slice(lane, lane + 1)
+        wav_path = base_path + ".wav"
+        writer = threading.Thread(target=self._write_snapshot, args=(records, base_path, lanes), name="snapshot")
+        writer.start()
+        self._writers.append(writer)
+        return wav_path
+
+    def _write_snapshot(self, records, base_path, lanes):
+        try:
+            directory = os.path.dirname(base_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            audio = records["audio"][..., lanes]
+            save_audio_file(base_path + ".wav", audio.reshape(-1, audio.shape[-1]), self.samplerate)
+            columns = {name: records[name] if records[name].ndim == 1 else records[name][:, lanes]
+                       for name in TRACE_FIELDS} # Per-lane fields keep only the saved lanes
+            trace = np.empty(len(records), dtype=[(name, column.dtype, column.shape[1:])
+                                                  for name, column in columns.items()])
+            for name, column in columns.items():
+                trace[name] = column
+            np.save(base_path + ".trace.npy", trace)
+        except OSError as e:
+            log_error(f"Could not write snapshot {base_path}", e)
+
+    def close(self):
+        for writer in self._writers:
+            writer.join()
+        self._records.flush()
+        del self._records
+
+
+class SplashDetector:
+    """Turns an audio block of shape (frames, channels) into one feature value per channel.
+
+    Subclasses implement `_compute` and must write into the preallocated `out`
+    array instead of returning new arrays, so a block never allocates.
+    """
+    name = "base"
+    transient = False # True when the feature peaks on a sound's first block only, so it cannot be confirmed over several
+    levels = None # Transient detectors: the block's level per lane, which a real splash sustains and a click does not
+
+    def __init__(self, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE):
+        self.block_size = block_size
+        self.channels = channels
+        self.samplerate = samplerate
+        self.features = np.zeros(channels, dtype=np.float64)
+        self.blocks = 0
+        self.cpu_time_s = 0.0 # Thread CPU time spent in `_compute`
+        self._ready = None # Lane mask of the block being processed, None for all lanes
+
+    def process(self, block, ready=None):
+        """`ready` masks the lanes that hold a real block; the others keep their state."""
+        self._ready = ready
+        start = time.thread_time()
+        self._compute(block, self.features)
+        self.cpu_time_s += time.thread_time() - start
+        self.blocks += 1
+        return self.features
+
+    def cost_per_block_us(self):
+        return self.cpu_time_s / self.blocks * 1e6 if self.blocks else 0.0
+
+    def cost_summary(self):
+        return f"Detector '{self.name}': {self.cost_per_block_us():.1f} us CPU/block over {self.blocks} blocks"
+
+    def _compute(self, block, out):
+        raise NotImplementedError
+
+
+class NormDetector(SplashDetector):
+    """Broadband L2 norm of the block, the original (and cheapest) splash check."""
+    name = "norm"
+
+    def __init__(self, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE):
+        super().__init__(block_size, channels, samplerate)
+        self._energy = np.zeros(channels, dtype=np.float32)
+
+    def _compute(self, block, out):
+        np.einsum("ij,ij->j", block, block, out=self._energy)
+        np.sqrt(self._energy, out=out)
+
+
+class BandEnergyDetector(SplashDetector):
+    """Energy of a Hann-windowed DFT restricted to `band_hz`.
+
+    Only the bins inside the band are computed, as one matrix product against a
+    precomputed windowed cos/sin basis. The result is scaled to the L2 norm of the
+    in-band signal, so thresholds keep the same units as the "norm" detector.
+    """
+    name = "band"
+
+    def __init__(self, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE,
+                 band_hz=SPLASH_BAND_HZ):
+        super().__init__(block_size, channels, samplerate)
+        resolution_hz = samplerate / block_size
+        first_bin = max(1, int(math.ceil(band_hz[0] / resolution_hz)))
+        last_bin = min(block_size // 2, int(math.floor(band_hz[1] / resolution_hz)))
+        if last_bin < first_bin:
+            raise ValueError(f"Band {band_hz} Hz is narrower than one DFT bin ({resolution_hz:.1f} Hz).")
+        self.band_hz = band_hz
+        self.num_bins = last_bin - first_bin + 1
+
+        window = np.hanning(block_size)
+        phase = 2.0 * np.pi * np.outer(np.arange(block_size), np.arange(first_bin, last_bin + 1)) / block_size
+        basis = np.concatenate([np.cos(phase), -np.sin(phase)], axis=1) * window[:, np.newaxis]
+        self._basis = np.ascontiguousarray(basis, dtype=np.float32) # (frames, 2 * num_bins)
+        self._scale = 2.0 / float(np.sum(window ** 2)) # One-sided DFT energy -> time-domain energy
+
+        self._spectrum = np.zeros((channels, 2 * self.num_bins), dtype=np.float32)
+        self._energy = np.zeros(channels, dtype=np.float32)
+
+    def _transform(self, block):
+        frames = block.shape[0]
+        if frames == self.block_size:
+            np.dot(block.T, self._basis, out=self._spectrum)
+        else: # Short final block: zero-pad by only using the leading basis rows
+            np.dot(block.T, self._basis[:frames], out=self._spectrum)
+
+    def _compute(self, block, out):
+        self._transform(block)
+        np.einsum("ij,ij->i", self._spectrum, self._spectrum, out=self._energy)
+        np.multiply(self._energy, self._scale, out=out)
+        np.sqrt(out, out=out)
+
+
+class TemplateDetector(BandEnergyDetector):
+    """Band energy weighted by how closely the block's spectrum matches a recorded splash.
+
+    The template's band magnitude spectrum is computed once; each block is then
+    correlated against it (cosine similarity, 0..1), so loud sounds with the wrong
+    spectral shape such as footsteps or voices are scaled down.
+    """
+    name = "template"
+
+    def __init__(self, template, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE,
+                 band_hz=SPLASH_BAND_HZ):
+        super().__init__(block_size, channels, samplerate, band_hz)
+        self._magnitude = np.zeros((channels, self.num_bins), dtype=np.float32)
+        self._scratch = np.zeros((channels, self.num_bins), dtype=np.float32)
+        self._dot = np.zeros(channels, dtype=np.float32)
+        self._norm = np.zeros(channels, dtype=np.float32)
+        self._template = self._template_profile(template)
+
+    def _template_profile(self, template):
+        # Use the loudest block-sized window of the recording, downmixed to mono
+        mono = np.asarray(template, dtype=np.float32).reshape(len(template), -1).mean(axis=1)
+        if len(mono) < self.block_size:
+            mono = np.pad(mono, (0, self.block_size - len(mono)))
+        energy = np.convolve(mono ** 2, np.ones(self.block_size, dtype=np.float32), mode="valid")
+        start = int(np.argmax(energy))
+        spectrum = mono[start:start + self.block_size] @ self._basis
+        magnitude = np.hypot(spectrum[:self.num_bins], spectrum[self.num_bins:])
+        norm = float(np.linalg.norm(magnitude))
+        if norm == 0.0:
+            raise ValueError("Splash template is silent in the detection band.")
+        return (magnitude / norm).astype(np.float32)
+
+    def _compute(self, block, out):
+        self._transform(block)
+        n = self.num_bins
+        np.multiply(self._spectrum[:, :n], self._spectrum[:, :n], out=self._magnitude)
+        np.multiply(self._spectrum[:, n:], self._spectrum[:, n:], out=self._scratch)
+        np.add(self._magnitude, self._scratch, out=self._magnitude)
+        np.sum(self._magnitude, axis=1, out=self._energy) # In-band energy, before the sqrt below
+        np.sqrt(self._magnitude, out=self._magnitude)
+
+        np.dot(self._magnitude, self._template, out=self._dot)
+        np.sqrt(self._energy, out=self._norm)
+        np.maximum(self._norm, 1e-12, out=self._norm)
+        np.divide(self._dot, self._norm, out=self._dot) # Cosine similarity with the template
+
+        np.multiply(self._energy, self._scale, out=out)
+        np.sqrt(out, out=out)
+        np.multiply(out, self._dot, out=out)
+
+
+class OnsetDetector(SplashDetector):
+    """Rise of the broadband L2 norm since the previous block (energy derivative).
+
+    With overlapping windows (hop_ms) it responds on the first hop that contains
+    a splash onset, and a steady loud background produces no rise at all.
+    """
+    name = "onset"
+    transient = True
+
+    def __init__(self, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE):
+        super().__init__(block_size, channels, samplerate)
+        self._energy = np.zeros(channels, dtype=np.float32)
+        self.levels = np.zeros(channels, dtype=np.float64) # Broadband L2 norm
+        self._previous = np.zeros(channels, dtype=np.float64)
+
+    def _compute(self, block, out):
+        np.einsum("ij,ij->j", block, block, out=self._energy)
+        np.sqrt(self._energy, out=self.levels)
+        np.subtract(self.levels, self._previous, out=out)
+        np.maximum(out, 0.0, out=out)
+        if self._ready is None:
+            np.copyto(self._previous, self.levels)
+        else:
+            np.copyto(self._previous, self.levels, where=self._ready) # A zero-filled lane is not silence
+
+
+class SpectralFluxDetector(BandEnergyDetector):
+    """Half-wave rectified spectral flux inside `band_hz`.
+
+    Sums how much each band bin's magnitude rose since the previous block, so a
+    broadband splash onset scores high while sustained sounds fade to zero.
+    Scaled like "band", in units of in-band L2 norm.
+    """
+    name = "flux"
+    transient = True
+
+    def __init__(self, block_size=BLOCK_SIZE, channels=CHANNELS, samplerate=SAMPLERATE,
+                 band_hz=SPLASH_BAND_HZ):
+        super().__init__(block_size, channels, samplerate, band_hz)
+        self._magnitude = np.zeros((channels, self.num_bins), dtype=np.float32)
+        self._previous = np.zeros((channels, self.num_bins), dtype=np.float32)
+        self._rise = np.zeros((channels, self.num_bins), dtype=np.float32)
+        self._amplitude_scale = math.sqrt(self._scale)
+        self._band_energy = np.zeros(channels, dtype=np.float32)
+        self.levels = np.zeros(channels, dtype=np.float64) # In-band L2 norm, as the "band" detector
+
+    def _compute(self, block, out):
+        self._transform(block)
+        n = self.num_bins
+        np.hypot(self._spectrum[:, :n], self._spectrum[:, n:], out=self._magnitude)
+        np.subtract(self._magnitude, self._previous, out=self._rise)
+        np.maximum(self._rise, 0.0, out=self._rise)
+        np.sum(self._rise, axis=1, out=self._energy)
+        np.multiply(self._energy, self._amplitude_scale, out=out)
+        np.einsum("ij,ij->i", self._magnitude, self._magnitude, out=self._band_energy)
+        np.multiply(self._band_energy, self._scale, out=self._band_energy)
+        np.sqrt(self._band_energy, out=self.levels)
+        if self._ready is None or self._ready.all():
+            self._magnitude, self._previous = self._previous, self._magnitude # Swap instead of copying
+        else:
+            np.copyto(self._previous, self._magnitude, where=self._ready[:, None]) # A zero-filled lane is not silence
+
+
+DETECTORS = {
+    NormDetector.name: NormDetector,
+    BandEnergyDetector.name: BandEnergyDetector,
+    TemplateDetector.name: TemplateDetector,
+    OnsetDetector.name: OnsetDetector,
+    SpectralFluxDetector.name: SpectralFluxDetector,
+}
+
+
+def make_detector(name, settings, channels=CHANNELS):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}'. Choose from: {', '.join(DETECTORS)}.")
+    kwargs = {"block_size": settings.detection_block_size, "channels": channels,
+              "samplerate": settings.detection_samplerate}
+    if name == TemplateDetector.name:
+        template = load_audio_file(settings.splash_template_path, settings.samplerate)
+        if settings.decimation > 1: # Same filter as the live audio, so the spectra compare
+            template = template.reshape(len(template), -1)
+            front_end = DecimatingFrontEnd(len(template) // settings.decimation * settings.decimation,
+                                           template.shape[1], settings.decimation, downmix=True)
+            decimated = np.zeros((front_end.output_size, 1), dtype=np.float32)
+            front_end.process(template[:len(template) // settings.decimation * settings.decimation], decimated)
+            template = decimated
+        return TemplateDetector(template, band_hz=settings.splash_band_hz, **kwargs)
+    if name in (BandEnergyDetector.name, SpectralFluxDetector.name):
+        return DETECTORS[name](band_hz=settings.splash_band_hz, **kwargs)
+    return DETECTORS[name](**kwargs)
+
+
+class NoiseFloorCalibrator:
+    """Online noise-floor tracker that derives the splash threshold from the detector feature.
+
+    Keeps an exponentially weighted mean and variance per lane (O(1) memory and
+    work per block, vectorized across lanes). Values above the current threshold
+    are clipped before updating, so splashes barely move the floor while a
+    lasting rise in background noise still pulls it up over a few time constants.
+    The threshold never drops below `min_threshold`: on a muted input (exact
+    zeros) it would otherwise reach 0 and clip every later value to 0 too.
+    """
+    def __init__(self, initial_threshold, lanes=CHANNELS, block_s=BLOCK_DURATION_MS / 1000.0,
+                 k_sigma=CALIBRATION_K_SIGMA, min_ratio=CALIBRATION_MIN_RATIO, min_threshold=CALIBRATION_MIN_THRESHOLD,
+                 time_constant_s=CALIBRATION_TIME_CONSTANT_S, warmup_s=CALIBRATION_WARMUP_S):
+        self.k_sigma = k_sigma
+        self.min_ratio = min_ratio
+        if min_threshold <= 0:
+            raise ValueError("calibration_min_threshold must be positive.")
+        self.min_threshold = min_threshold
+        self.alpha = min(1.0, block_s / time_constant_s)
+        self.warmup_blocks = max(1, int(round(warmup_s / block_s)))
+        self.noise_floor = np.zeros(lanes)
+        self.variance = np.zeros(lanes)
+        self.count = np.zeros(lanes, dtype=np.int64)
+        self.threshold = np.zeros(lanes)
+        self.threshold[:] = initial_threshold # Scalar, or one starting threshold per lane
+        self._value = np.zeros(lanes)
+        self._diff = np.zeros(lanes)
+        self._increment = np.zeros(lanes)
+        self._active = np.ones(lanes, dtype=bool)
+        self._mask = np.zeros(lanes, dtype=bool)
+
+    def warmed_up(self, lane=0):
+        return self.count[lane] >= self.warmup_blocks
+
+    def update(self, values, ready=None):
+        """Fold one feature value per lane into the statistics (only lanes marked `ready`)."""
+        active = self._active
+        if ready is not None:
+            np.copyto(active, ready)
+        np.copyto(self._value, values)
+        np.greater_equal(self.count, self.warmup_blocks, out=self._mask)
+        np.minimum(self._value, self.threshold, out=self._value, where=self._mask)
+
+        np.subtract(self._value, self.noise_floor, out=self._diff)
+        np.multiply(self._diff, self.alpha, out=self._increment)
+        np.multiply(self._diff, self._increment, out=self._diff)
+        np.add(self.variance, self._diff, out=self._diff)
+        np.multiply(self._diff, 1.0 - self.alpha, out=self.variance, where=active)
+        np.add(self.noise_floor, self._increment, out=self.noise_floor, where=active)
+
+        # A lane's first value initialises its floor directly
+        np.equal(self.count, 0, out=self._mask)
+        np.logical_and(self._mask, active, out=self._mask)
+        np.copyto(self.noise_floor, self._value, where=self._mask)
+        np.copyto(self.variance, 0.0, where=self._mask)
+        np.add(self.count, active, out=self.count)
+
+        np.greater_equal(self.count, self.warmup_blocks, out=self._mask)
+        np.logical_and(self._mask, active, out=self._mask)
+        np.sqrt(self.variance, out=self._diff)
+        np.multiply(self._diff, self.k_sigma, out=self._diff)
+        np.add(self._diff, self.noise_floor, out=self._diff)
+        np.multiply(self.noise_floor, self.min_ratio, out=self._increment)
+        np.maximum(self._increment, self.min_threshold, out=self._increment) # Never 0, or clipping would pin the floor there
+        np.maximum(self._diff, self._increment, out=self.threshold, where=self._mask)
+        return self.threshold
+
+    def summary(self, lane=0):
+        state = "" if self.warmed_up(lane) else " (warming up)"
+        return f"Noise floor: {self.noise_floor[lane]:.4f} | Threshold: {self.threshold[lane]:.4f}{state}"
+
+
+class SplashConfirmer:
+    """Per-lane state machine that turns feature/threshold pairs into confirmed splashes.
+
+    A lane arms on the first block above its threshold and stays armed while the
+    feature is above `release_ratio` times the threshold (hysteresis). The splash
+    is confirmed once the run has lasted `min_s` and the mean feature over its
+    last `confirm_blocks` blocks reaches `mean_ratio` times the threshold, so
+    one loud transient block is not enough. The mean is over that trailing
+    window, not the whole run, so a long stretch just under the threshold cannot
+    average a real splash away. After a confirmation the lane is latched until
+    the feature falls below the release level, and nothing is confirmed for
+    `refractory_s`. With `sustain` (the transient detectors), the feature only
+    arms the lane: the run then lasts while the detector's `levels` stay at least
+    `release_ratio` times the threshold above their level before the onset, and
+    no mean is required, so a click that is gone after one block is not a splash.
+    Only counts and the window's running sum are kept: O(1) memory and work per
+    block, vectorized across lanes, with no allocation.
+    """
+    def __init__(self, lanes=CHANNELS, block_s=BLOCK_DURATION_MS / 1000.0, min_s=CONFIRM_MIN_S,
+                 release_ratio=CONFIRM_RELEASE_RATIO, mean_ratio=CONFIRM_MEAN_RATIO, refractory_s=REFRACTORY_S,
+                 sustain=False):
+        if not 0.0 < release_ratio <= 1.0:
+            raise ValueError("confirm_release_ratio must be in (0, 1].")
+        self.block_s = block_s
+        self.release_ratio = release_ratio
+        self.mean_ratio = mean_ratio
+        self.sustain = sustain
+        self.confirm_blocks = 1 + int(math.ceil(min_s / block_s - 1e-9))
+        self.refractory_blocks = int(math.ceil(refractory_s / block_s - 1e-9))
+        self.run_blocks = np.zeros(lanes, dtype=np.int64) # Blocks in the current run, 0 when not armed
+        self.window_sum = np.zeros(lanes) # Sum of feature / threshold over the last confirm_blocks blocks
+        self.since_confirmed = np.full(lanes, self.refractory_blocks, dtype=np.int64)
+        self.latched = np.zeros(lanes, dtype=bool)
+        self.armed = np.zeros(lanes, dtype=bool) # Run in progress after this block, not yet confirmed
+        self.confirmed = np.zeros(lanes, dtype=bool) # Splash confirmed on this block
+        self.confirm_delay_s = np.zeros(lanes) # From the splash (last rise above the threshold) to the confirming block
+        self.since_crossing = np.zeros(lanes, dtype=np.int64) # Blocks since the feature last rose above the threshold
+        self.confirmations = 0
+        self._ratio = np.zeros(lanes)
+        self._above = np.zeros(lanes, dtype=bool)
+        self._mask = np.zeros(lanes, dtype=bool)
+        self._was_above = np.zeros(lanes, dtype=bool) # Feature above the threshold on the lane's previous block
+        self._crossed = np.zeros(lanes, dtype=bool)
+        self._last_level = np.zeros(lanes) # Sustain mode: the level on each lane's previous block
+        self._level_floor = np.zeros(lanes) # Sustain mode: the level before the run, plus the release level
+        self._release_level = np.zeros(lanes)
+        self._ready = np.ones(lanes, dtype=bool)
+        self._idle = np.ones(lanes, dtype=bool)
+        self._threshold = np.zeros(lanes)
+        self._ratios = np.zeros(self.confirm_blocks * lanes) # Trailing window per lane, slot-major
+        self._slot = np.zeros(lanes, dtype=np.int64) # Each lane's oldest (next to overwrite) slot
+        self._lane_index = np.arange(lanes, dtype=np.int64)
+        self._index = np.zeros(lanes, dtype=np.int64)
+        self._oldest = np.zeros(lanes)
+        self._newest = np.zeros(lanes)
+
+    def update(self, values, thresholds, ready=None, levels=None):
+        """Advance every `ready` lane by one block. Returns the `confirmed` mask.
+
+        `levels` is the detector's per-lane level, needed in sustain mode only.
+        """
+        if ready is not None:
+            np.copyto(self._ready, ready)
+        ratio, above, mask = self._ratio, self._above, self._mask
+        np.maximum(thresholds, 1e-12, out=self._threshold) # A 0 threshold must not divide by zero
+        np.divide(values, self._threshold, out=ratio)
+        # Slide each ready lane's window by one block
+        np.multiply(self._slot, len(self._lane_index), out=self._index)
+        np.add(self._index, self._lane_index, out=self._index)
+        np.take(self._ratios, self._index, out=self._oldest)
+        np.copyto(self._newest, self._oldest)
+        np.copyto(self._newest, ratio, where=self._ready)
+        np.put(self._ratios, self._index, self._newest)
+        np.add(self.window_sum, self._newest, out=self.window_sum)
+        np.subtract(self.window_sum, self._oldest, out=self.window_sum)
+        np.add(self._slot, self._ready, out=self._slot)
+        np.remainder(self._slot, self.confirm_blocks, out=self._slot)
+        # The splash is where the feature last rose above the threshold, however long the run before it
+        np.greater(ratio, 1.0, out=mask)
+        np.logical_not(self._was_above, out=self._crossed)
+        np.logical_and(self._crossed, mask, out=self._crossed)
+        np.logical_and(self._crossed, self._ready, out=self._crossed)
+        np.add(self.since_crossing, self._ready, out=self.since_crossing)
+        np.copyto(self.since_crossing, 0, where=self._crossed)
+        np.copyto(self._was_above, mask, where=self._ready)
+        # A latched lane is released once the feature falls below the release level
+        np.greater(ratio, self.release_ratio, out=above)
+        np.logical_and(self.latched, above, out=mask)
+        np.copyto(self.latched, mask, where=self._ready)
+
+        # Armed lanes continue above the release level; idle ones start above the threshold
+        if self.sustain:
+            np.greater(levels, self._level_floor, out=above)
+        np.greater(ratio, 1.0, out=mask)
+        np.copyto(above, mask, where=self._idle)
+        np.logical_not(self.latched, out=mask)
+        np.logical_and(above, mask, out=above)
+        np.add(self.run_blocks, 1, out=self.run_blocks, where=self._ready)
+        np.logical_not(above, out=mask)
+        np.logical_and(mask, self._ready, out=mask)
+        np.copyto(self.run_blocks, 0, where=mask)
+        np.add(self.since_confirmed, self._ready, out=self.since_confirmed)
+        if self.sustain: # A new run must stay above the level from before its onset
+            np.equal(self.run_blocks, 1, out=mask)
+            np.logical_and(mask, self._ready, out=mask)
+            np.copyto(self._level_floor, self._last_level, where=mask)
+            np.multiply(self._threshold, self.release_ratio, out=self._release_level)
+            np.add(self._level_floor, self._release_level, out=self._level_floor, where=mask)
+            np.copyto(self._last_level, levels, where=self._ready)
+
+        confirmed = self.confirmed
+        np.greater_equal(self.run_blocks, self.confirm_blocks, out=confirmed)
+        if not self.sustain:
+            # Once the run spans confirm_blocks blocks, the window holds only the run
+            np.greater_equal(self.window_sum, self.confirm_blocks * self.mean_ratio, out=mask)
+            np.logical_and(confirmed, mask, out=confirmed)
+        np.greater_equal(self.since_confirmed, self.refractory_blocks, out=mask)
+        np.logical_and(confirmed, mask, out=confirmed)
+        np.logical_and(confirmed, self._ready, out=confirmed)
+        if confirmed.any():
+            # Capped at the confirming window, so a run that stays above the threshold for long cannot stretch it
+            np.minimum(self.since_crossing, self.confirm_blocks - 1, out=self.confirm_delay_s, where=confirmed)
+            np.multiply(self.confirm_delay_s, self.block_s, out=self.confirm_delay_s, where=confirmed)
+            np.logical_or(self.latched, confirmed, out=self.latched)
+            np.copyto(self.run_blocks, 0, where=confirmed)
+            np.copyto(self.since_confirmed, 0, where=confirmed)
+            self.confirmations += int(np.count_nonzero(confirmed))
+        np.greater(self.run_blocks, 0, out=self.armed)
+        np.logical_not(self.armed, out=self._idle)
+        return confirmed
+
+    def summary(self):
+        if self.sustain:
+            return (f"Confirmation: onset above threshold, then {self.confirm_blocks} block(s) with the level "
+                    f"{self.release_ratio:.2f}x threshold above its pre-onset value, "
+                    f"refractory {self.refractory_blocks} block(s)")
+        return (f"Confirmation: {self.confirm_blocks} block(s) above {self.release_ratio:.2f}x threshold, "
+                f"mean >= {self.mean_ratio:.2f}x, refractory {self.refractory_blocks} block(s)")
+
+
+def make_confirmer(settings, lanes=CHANNELS, transient=False):
+    return SplashConfirmer(lanes, block_s=settings.hop_s, min_s=settings.confirm_min_s, # One update per hop
+                           release_ratio=settings.confirm_release_ratio, mean_ratio=settings.confirm_mean_ratio,
+                           refractory_s=settings.refractory_s, sustain=transient)
+
+
+def make_calibrator(settings, initial_threshold=None, lanes=CHANNELS):
+    initial_threshold = settings.splash_threshold if initial_threshold is None else initial_threshold
+    return NoiseFloorCalibrator(initial_threshold, lanes=lanes, block_s=settings.hop_s, # One update per hop
+                                k_sigma=settings.calibration_k_sigma, min_ratio=settings.calibration_min_ratio,
+                                min_threshold=settings.calibration_min_threshold,
+                                time_constant_s=settings.calibration_time_constant_s,
+                                warmup_s=settings.calibration_warmup_s)
+
+
+def load_splash_labels(path):
+    """Read labeled splash times (seconds, first column), one per line. '#' starts a comment."""
+    labels = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                labels.append(float(line.replace(",", " ").split()[0]))
+    return sorted(labels)
+
+
+def score_detections(detections, labels, window=REPLAY_MATCH_WINDOW_S):
+    """Greedily match detection times to labels. Returns (matched latencies, false positives)."""
+    latencies = []
+    false_positives = 0
+    unmatched = list(labels)
+    for detected_at in detections:
+        match = next((label for label in unmatched
+                      if window[0] <= detected_at - label <= window[1]), None)
+        if match is None:
+            false_positives += 1
+        else:
+            unmatched.remove(match)
+            latencies.append(detected_at - match)
+    return latencies, false_positives
+
+
+def percentile_summary(values, scale=1.0, percentiles=(50, 95, 99)):
+    if not len(values):
+        return "n/a"
+    values = np.asarray(values, dtype=np.float64) * scale
+    parts = [f"p{p}={np.percentile(values, p):.1f}" for p in percentiles]
+    return f"mean={values.mean():.1f} " + " ".join(parts) + f" max={values.max():.1f}"
+
+
+def replay_recording(samples, detector, threshold, realtime=False, refractory_s=REPLAY_REFRACTORY_S,
+                     calibrator=None, latency=None, hop_size=None, capacity=RING_BUFFER_BLOCKS, front_end=None,
+                     confirmer=None):
+    """Stream recorded samples through a DetectionPipeline in detector-sized blocks.
+
+    Uses the same callback -> ring buffer -> detector path as a live session. In
+    realtime mode blocks are paced at the stream rate and drained by the detector
+    thread; otherwise each block is processed inline as fast as possible. With a
+    calibrator, the threshold follows the recording's noise floor instead. With a
+    `hop_size` smaller than the detector's block, the recording is fed in hops and
+    analysed with overlapping windows, as in low-latency mode. With a `front_end`,
+    `samples` are at the device rate and `hop_size` counts device frames; the
+    detector works on the decimated blocks, as in a live session. Splashes are
+    decided by `confirmer`, a one-lane SplashConfirmer; without one, every block
+    above the threshold counts, `refractory_s` apart.
+    Returns (detection times in seconds, wall-clock seconds spent, the pipeline).
+    """
+    factor = front_end.factor if front_end else 1
+    block_size = hop_size or detector.block_size * factor
+    samplerate = detector.samplerate * factor
+    window = (SlidingWindow(detector.block_size, detector.channels)
+              if block_size // factor < detector.block_size else None)
+    if confirmer is None: # The single-block trigger
+        confirmer = SplashConfirmer(1, block_size / samplerate, min_s=0.0, release_ratio=1.0,
+                                    mean_ratio=1.0, refractory_s=refractory_s)
+    thresholds = np.zeros(1)
+    detections = []
+    blocks_seen = [0]
+
+    def on_block(block, ready):
+        picked_up = time.monotonic()
+        blocks_seen[0] += 1
+        block_end_s = blocks_seen[0] * block_size / samplerate
+        if window is not None:
+            block = window.push(block)
+        detector.process(block)
+        if latency is not None:
+            latency.record("detector", time.monotonic() - picked_up)
+        thresholds[0] = threshold
+        if calibrator is not None:
+            thresholds[0] = calibrator.threshold[0] # Decide against the threshold from before this block
+            calibrator.update(detector.features)
+        if confirmer.update(detector.features, thresholds, levels=detector.levels)[0]:
+            detections.append(block_end_s)
+
+    pipeline = DetectionPipeline(on_block, block_size=block_size, channels=samples.shape[1],
+                                 capacity=capacity, latency=latency, dtype=samples.dtype,
+                                 front_ends=[front_end] if front_end else None)
+    push = pipeline.input_callback(0)
+    if realtime:
+        pipeline.start()
+    block_s = block_size / samplerate
+    wall_start = time.perf_counter()
+    for index, start in enumerate(range(0, len(samples), block_size)):
+        chunk = samples[start:start + block_size]
+        if realtime:
+            pause = wall_start + index * block_s - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+        push(chunk, len(chunk), None, None)
+        if not realtime:
+            pipeline.process_pending()
+    if realtime:
+        while pipeline.pending():
+            time.sleep(0.001)
+        pipeline.stop()
+    return detections, time.perf_counter() - wall_start, pipeline
+
+
+def print_detection_score(prefix, detections, labels):
+    latencies, false_positives = score_detections(detections, labels)
+    hits = len(latencies)
+    precision = hits / len(detections) if detections else 0.0
+    recall = hits / len(labels) if labels else 0.0
+    print(f"{prefix} precision {precision:.3f} recall {recall:.3f} "
+          f"(TP {hits}, FP {false_positives}, FN {len(labels) - hits})")
+    print(f"{prefix} detection latency ms: {percentile_summary(latencies, scale=1000.0)}")
+
+
+def run_benchmark(recordings, detector_names, settings, realtime=False, labels_path=None):
+    """Replay each recording through each detector and print accuracy/latency/throughput.
+
+    Block size, sample rate, threshold, auto-threshold and splash confirmation come
+    from `settings`, so a benchmark exercises the same configuration as a live
+    session. With labels, the single-block trigger is scored as well, to show what
+    the confirmation gains in false positives and costs in latency.
+    """
+    for path in recordings:
+        try:
+            benchmark_recording(path, detector_names, settings, realtime, labels_path)
+        except (OSError, ValueError, wave.Error) as e:
+            print(f"ERROR: Could not replay {path}: {e}", file=sys.stderr)
+            return 2
+    return 0
+
+
+def benchmark_recording(path, detector_names, settings, realtime=False, labels_path=None):
+    """run_benchmark for one recording.
+
+    A recording at another rate than `settings.samplerate`, such as a flight
+    recorder snapshot of decimated audio, is replayed at its own rate without
+    decimation, i.e. as the detector heard it.
+    """
+    rate = audio_file_samplerate(path)
+    own_rate = rate is not None and rate != settings.samplerate
+    if own_rate:
+        settings = settings.copy(samplerate=rate, decimation=1)
+    threshold = settings.splash_threshold
+    samples = load_audio_file(path, settings.samplerate)
+    if np.dtype(settings.input_dtype) == np.int16: # Feed the device format the front end expects
+        samples = np.round(np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    downmix = samples.shape[1] != CHANNELS # The live stream is mono
+    duration_s = len(samples) / settings.samplerate
+    label_file = labels_path or os.path.splitext(path)[0] + ".labels.txt"
+    labels = load_splash_labels(label_file) if os.path.exists(label_file) else None
+    print(f"== {path}: {duration_s:.1f}s, "
+          f"{'no labels' if labels is None else f'{len(labels)} labeled splashes'}")
+    if own_rate:
+        print(f"   recorded at {rate} Hz: replaying at that rate without decimation")
+    print(f"   window {settings.block_size} samples ({settings.block_s * 1000:.1f} ms), "
+          f"hop {settings.hop_size} samples ({settings.hop_s * 1000:.1f} ms)")
+    if settings.decimation > 1 or downmix or np.dtype(settings.input_dtype) != np.float32:
+        print(f"   front end: {samples.shape[1]}ch {settings.input_dtype} at {settings.samplerate} Hz -> "
+              f"{CHANNELS}ch float32 at {settings.detection_samplerate:.0f} Hz (decimation {settings.decimation})")
+
+    for name in detector_names:
+        detector = make_detector(name, settings)
+        calibrator = make_calibrator(settings) if settings.auto_threshold else None
+        latency = LatencyRecorder()
+        front_end = make_front_end(settings, samples.shape[1], downmix)
+        confirmer = make_confirmer(settings, transient=detector.transient)
+        detections, wall_s, pipeline = replay_recording(samples, detector, threshold, realtime,
+                                                        calibrator=calibrator, latency=latency,
+                                                        hop_size=settings.hop_size,
+                                                        capacity=settings.ring_capacity,
+                                                        front_end=front_end, confirmer=confirmer)
+        blocks = pipeline.blocks_processed
+        print(f"  [{name}] {len(detections)} detections, {detector.cost_summary()}")
+        front_end_s = front_end.cpu_time_s if front_end else 0.0
+        print(f"  [{name}] CPU per stream: {(front_end_s + detector.cpu_time_s) / duration_s * 1000:.2f} ms "
+              f"per audio second (front end {front_end_s / duration_s * 1000:.2f}, "
+              f"detector {detector.cpu_time_s / duration_s * 1000:.2f})")
+        if calibrator is not None:
+            print(f"  [{name}] {calibrator.summary()}")
+        print(f"  [{name}] {confirmer.summary()}")
+        print(f"  [{name}] throughput {blocks / wall_s:.0f} blocks/s "
+              f"({duration_s / wall_s:.1f}x real time), {pipeline.stats_summary()}")
+        for line in latency.summary_lines():
+            print(f"  [{name}] {line}")
+        if labels is None:
+            continue
+        print_detection_score(f"  [{name}]", detections, labels)
+        # Same replay with the single-block trigger, run inline since only the decisions matter
+        single_block, _, _ = replay_recording(samples, make_detector(name, settings), threshold,
+                                              refractory_s=settings.refractory_s,
+                                              calibrator=make_calibrator(settings) if settings.auto_threshold else None,
+                                              hop_size=settings.hop_size, capacity=settings.ring_capacity,
+                                              front_end=make_front_end(settings, samples.shape[1], downmix))
+        print_detection_score(f"  [{name}] single-block trigger:", single_block, labels)
+
+
+def print_metrics_report(path):
+    """Print catches/hour, false-trigger rate and latency percentiles per session and per config.
+
+    A reel counts as a catch unless the user flagged it as a false trigger.
+    Configs are grouped per mode, so simulated sessions never pool with live ones.
+    """
+    if not os.path.exists(path):
+        print(f"ERROR: No metrics store at {path}.", file=sys.stderr)
+        return 2
+    connection = sqlite3.connect(path)
+    try:
+        sessions = connection.execute(
+            "SELECT id, started, mode, detector, config_hash, duration_s FROM sessions ORDER BY id").fetchall()
+        counts = collections.defaultdict(collections.Counter)
+        for session_id, kind, count in connection.execute(
+                "SELECT session_id, kind, COUNT(*) FROM events GROUP BY session_id, kind"):
+            counts[session_id][kind] = count
+        latencies = collections.defaultdict(list)
+        for session_id, kind, latency_s in connection.execute(
+                "SELECT session_id, kind, latency_s FROM events WHERE latency_s IS NOT NULL"):
+            latencies[session_id, kind].append(latency_s)
+    finally:
+        connection.close()
+
+    def report(label, hours, events, detection_latencies, reel_latencies):
+        reels, false_triggers = events["reel"], events["false_trigger"]
+        catches_per_hour = (reels - false_triggers) / hours if hours else 0.0
+        false_trigger_rate = false_triggers / reels if reels else 0.0
+        print(f"  {label} {hours:.2f} h: casts {events['cast']}, detections {events['detection']}, "
+              f"reels {reels}, skips {events['skip']}, misses {events['miss']}, false triggers {false_triggers}, "
+              f"errors {events['error']}, reconnects {events['reconnect']} | catches/h {catches_per_hour:.1f}, false-trigger rate {false_trigger_rate:.1%}")
+        print(f"      detection latency ms: {percentile_summary(detection_latencies, scale=1000.0)}")
+        print(f"      end-to-end latency ms: {percentile_summary(reel_latencies, scale=1000.0)}")
+
+    print(f"== Sessions ({path})")
+    configs = {}
+    for session_id, started, mode, detector, config_key, duration_s in sessions:
+        hours = (duration_s or 0.0) / 3600
+        detection, reel = latencies[session_id, "detection"], latencies[session_id, "reel"]
+        state = "" if duration_s is not None else " (unfinished)"
+        report(f"#{session_id} {started} {mode} {detector} [cfg {config_key}]{state}",
+               hours, counts[session_id], detection, reel)
+        group = configs.setdefault((mode, config_key), {"detector": detector, "sessions": 0, "hours": 0.0,
+                                                "events": collections.Counter(), "detection": [], "reel": []})
+        group["sessions"] += 1
+        group["hours"] += hours
+        group["events"].update(counts[session_id])
+        group["detection"].extend(detection)
+        group["reel"].extend(reel)
+    print("== Configs")
+    for (mode, config_key), group in configs.items():
+        report(f"[cfg {config_key}] {mode} {group['detector']}, {group['sessions']} session(s),",
+               group["hours"], group["events"], group["detection"], group["reel"])
+    return 0
+
+
+def list_input_devices():
+    """Input-capable PortAudio devices as [{"id": index, "name": name}]; empty if PortAudio fails."""
+    devices = []
+    try:
+        device_list = sd.query_devices()
+        for i, device_info in enumerate(device_list):
+            if device_info['max_input_channels'] > 0:
+                # sounddevice accepts the PortAudio index `i` (or the name) as the device
+                devices.append({"id": i, "name": device_info['name']})
+    except Exception as e:
+        # This might happen if PortAudio isn't found or there's a driver issue
+        print(f"Error querying audio devices: {e}")
+    return devices
+
+
+class DeviceCatalog:
+    """Cached list_input_devices(), refreshed on a background thread.
+
+    Importing sounddevice and querying PortAudio can take long enough to be felt
+    at startup, so callers start a `refresh` and read `devices` once `ready` is set.
+    """
+    def __init__(self):
+        self.devices = None
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def refresh(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return # A refresh is already under way
+            self.ready.clear()
+            self._thread = threading.Thread(target=self._run, name="devices", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until a refresh under way has finished; PortAudio must not be reinitialised during one."""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _run(self):
+        self.devices = list_input_devices()
+        self.ready.set()
+
+
+DEVICE_CATALOG = DeviceCatalog()
+
+
+def resolve_streams(settings, device=None):
+    """The input streams to open: `settings.streams`, or one stream on `device`.
+
+    Each entry is completed to {"device", "channels", "name", "splash_threshold",
+    "downmix", "lanes"}; every channel of a stream is a separate game instance,
+    unless "downmix" averages them into one lane.
+    """
+    entries = settings.streams or [{"device": device if device is not None else settings.device}]
+    streams = []
+    for index, entry in enumerate(entries):
+        unknown = sorted(set(entry) - {"device", "channels", "name", "splash_threshold", "downmix"})
+        if unknown:
+            raise ValueError(f"Unknown stream setting(s): {', '.join(unknown)}")
+        stream = {"device": None, "channels": CHANNELS, "splash_threshold": settings.splash_threshold, "downmix": False}
+        stream.update(entry)
+        stream["lanes"] = 1 if stream["downmix"] else stream["channels"]
+        if stream["channels"] < 1:
+            raise ValueError("Stream channels must be at least 1.")
+        if stream["splash_threshold"] <= 0:
+            raise ValueError("Threshold must be positive.")
+        stream.setdefault("name", f"stream{index}" if stream["device"] is None else f"dev{stream['device']}")
+        streams.append(stream)
+    return streams
+
+
+class FishingSession:
+    """One game instance: its cast/reel/mouse state and humanized actions.
+
+    A FishingEngine runs one session per detector lane (one input stream, or one
+    channel of a multichannel device). Sessions share the engine's scheduler,
+    so all of their events run on the one worker thread.
+    """
+    def __init__(self, engine, lane=0, input_index=0, name="", mouse_controller=None):
+        self.engine = engine
+        self.settings = engine.settings
+        self.clock = engine.clock
+        self.mouse_controller = mouse_controller # From the engine's backend; shared by all live sessions (allow_shared_mouse)
+        self.right_button = engine.backend.right_button
+        self.lane = lane # Column of the detector batch this session listens to
+        self.input_index = input_index # Pipeline input (sounddevice stream) the lane comes from
+        self.name = name
+        self._prefix = f"[{name}] " if name else ""
 
         # Bot state variables
         self.is_rod_cast = False
         self.last_cast_time = 0
-        self.bot_start_time = 0
-        self.current_session_duration = 0
+        self.cooldown_until = 0 # Drawn once per cast
         self.last_mouse_action_time = 0
         self.next_mouse_action_interval = 0
-        self.splash_threshold = DEFAULT_SPLASH_THRESHOLD # Allow modification later
+        self.splash_threshold = engine.settings.splash_threshold
+        self.reel_pending = False # A reel-in (or skip) is scheduled on the worker
+        self.mouse_action_overdue = False
+        self.casts = 0
+        self.splashes = 0
+        self.reels = 0
+        self.skips = 0
+
+    def start(self):
+        # Worker thread: first events of the session.
+        self.last_mouse_action_time = self.clock.monotonic()
+        self._schedule_mouse_action()
+        self._cast_rod_from_thread()
+
+    def stats_line(self):
+        return (f"{self._prefix}casts {self.casts}, splashes {self.splashes}, "
+                f"reels {self.reels}, skips {self.skips}")
 
-        self.audio_devices = self._get_audio_devices()
-        # self.selected_device_id is used by tk.IntVar, not directly for sd.
-        # The actual device ID for sounddevice is derived during _start_fishing_clicked
+    def _update_status(self, message):
+        self.engine._update_status(self._prefix + message)
+
+
+    # --- Core Bot Logic ---
+    # Everything below except on_feature runs as timed events on the worker
+    # thread's scheduler, and nothing polls. on_feature runs on the detector
+    # thread and writes splashes, splash_threshold and reel_pending (only
+    # False -> True, handing the splash to the worker). The worker clears
+    # reel_pending only once is_rod_cast is False, so the detector thread never
+    # sees a cast rod without a pending reel while a reel is being handled.
+    def _smooth_mouse_move(self, dx, dy, steps=None, on_done=None, step=1, moved=(0, 0)):
+        if self.engine.stop_event.is_set(): return
+        steps = steps or self.settings.mouse_move_steps
+        current_x, current_y = moved # pynput's move is relative, so track what has been moved so far
+
+        # Calculate the target position for this step based on overall dx, dy
+        target_x_for_step = dx * (step / steps)
+        target_y_for_step = dy * (step / steps)
+
+        # Calculate the movement for this specific step
+        move_x = int(target_x_for_step - current_x)
+        move_y = int(target_y_for_step - current_y)
+
+        self.mouse_controller.move(move_x, move_y)
+        moved = (current_x + move_x, current_y + move_y)
+        if step < steps:
+            self.engine.scheduler.call_later(random.uniform(0.005, 0.015), self._smooth_mouse_move,
+                                      dx, dy, steps, on_done, step + 1, moved)
+        elif on_done:
+            on_done()
+
+    def _schedule_mouse_action(self):
+        self.next_mouse_action_interval = random.uniform(self.settings.mouse_wiggle_interval_s[0], self.settings.mouse_wiggle_interval_s[1]) * 1.0 # Ensure float
+        self.engine.scheduler.call_at(self.last_mouse_action_time + self.next_mouse_action_interval, self._mouse_action_due)
+
+    def _mouse_action_due(self):
+        if self.is_rod_cast:
+            self._perform_mouse_action()
+        else:
+            self.mouse_action_overdue = True # Done as soon as the rod is back in the water
 
-        self._setup_widgets()
-        self.root.protocol("WM_DELETE_WINDOW", self._on_closing) # Handle window close
+    def _perform_mouse_action(self):
+        self.mouse_action_overdue = False
+        if random.random() < self.settings.mouse_look_around_chance:
+            self._update_status("[HUMANIZE] Performing a 'look around'.")
+            angle = random.uniform(0, 2 * math.pi)
+            distance = random.uniform(self.settings.mouse_look_around_dist_px[0], self.settings.mouse_look_around_dist_px[1])
+            dx = int(distance * math.cos(angle))
+            dy = int(distance * math.sin(angle))
+            self._smooth_mouse_move(dx, dy, steps=random.randint(10, 20), on_done=self._mouse_action_done)
+        else:
+            dx = random.randint(self.settings.mouse_wiggle_delta_px[0], self.settings.mouse_wiggle_delta_px[1])
+            dy = random.randint(self.settings.mouse_wiggle_delta_px[0], self.settings.mouse_wiggle_delta_px[1])
+            self._smooth_mouse_move(dx, dy, steps=random.randint(3, 7), on_done=self._mouse_action_done)
+
+    def _mouse_action_done(self):
+        self.last_mouse_action_time = self.clock.monotonic()
+        self._schedule_mouse_action()
+
+    def _cast_rod_from_thread(self):
+        recast_base_wait = random.uniform(self.settings.recast_delay_base_s[0], self.settings.recast_delay_base_s[1])
+        self._update_status(f"[ACTION] Base wait {recast_base_wait:.2f}s to recast...")
+        cast_due = self.clock.monotonic() + recast_base_wait
+        self.engine.scheduler.call_at(cast_due, self._cast_rod_due, cast_due)
+
+    def _cast_rod_due(self, cast_due):
+        if self.engine.stop_event.is_set(): return
+
+        if random.random() < self.settings.fumble_recast_chance:
+            fumble_type = random.choice(["miss", "double_tap", "hesitate"])
+            self._update_status(f"[HUMANIZE] Fumbling recast ({fumble_type})...")
+            extra_fumble_delay = random.uniform(self.settings.fumble_recast_extra_delay_s[0], self.settings.fumble_recast_extra_delay_s[1])
+
+            if fumble_type == "miss":
+                self._update_status(f"[HUMANIZE] ...missed, waiting {extra_fumble_delay:.2f}s.")
+                self.engine.scheduler.call_later(extra_fumble_delay, self._cast_rod_from_thread)
+
+            elif fumble_type == "double_tap":
+                clicked = self._click_right("cast_jitter", cast_due)
+                self.engine.scheduler.call_at(clicked + random.uniform(0.05, 0.15), self._double_tap_second_click,
+                                       extra_fumble_delay)
 
-    def _get_audio_devices(self):
-        devices = []
+            elif fumble_type == "hesitate":
+                self._update_status(f"[HUMANIZE] ...hesitating for {extra_fumble_delay:.2f}s.")
+                hesitate_due = self.clock.monotonic() + extra_fumble_delay
+                self.engine.scheduler.call_at(hesitate_due, self._cast_after_hesitation, hesitate_due)
+        else:
+            self._update_status("[ACTION] Casting rod...")
+            self._click_right("cast_jitter", cast_due)
+            self._rod_cast_done()
+
+    def _double_tap_second_click(self, extra_fumble_delay):
+        if self.engine.stop_event.is_set(): return
+        self.mouse_controller.click(self.right_button)
+        self._update_status(f"[HUMANIZE] ...double tapped.")
+        self.engine.scheduler.call_later(random.uniform(0.1, 0.3) + extra_fumble_delay / 2, self._rod_cast_done)
+
+    def _cast_after_hesitation(self, hesitate_due):
+        if self.engine.stop_event.is_set(): return
+        self._click_right("cast_jitter", hesitate_due)
+        self._update_status(f"[ACTION] Casting (after hesitation).")
+        self._rod_cast_done()
+
+    def _rod_cast_done(self):
+        if self.engine.stop_event.is_set(): return
+        self.last_cast_time = self.clock.monotonic()
+        cooldown = random.uniform(self.settings.post_cast_cooldown_s[0], self.settings.post_cast_cooldown_s[1])
+        self.cooldown_until = self.last_cast_time + cooldown
+        self.is_rod_cast = True # Last: the detector thread must not see a cast rod with the old cooldown
+        self.casts += 1
+        self.engine.record_event("cast", self.lane)
+        self._update_status(f"[INFO] Rod cast. Cooldown: {cooldown:.1f}s.")
+        if self.mouse_action_overdue:
+            self._perform_mouse_action()
+        if self.engine.recorder or self.engine.metrics:
+            self.engine.scheduler.call_later(self.settings.miss_timeout_s, self._miss_timeout_due, self.casts)
+
+    def _miss_timeout_due(self, cast_number):
+        # Still waiting on the same cast: the bite was probably missed, keep the audio for analysis.
+        if self.is_rod_cast and not self.reel_pending and self.casts == cast_number:
+            self.engine.record_event("miss", self.lane)
+            if self.engine.recorder:
+                self._update_status(f"[RECORDER] No splash {self.settings.miss_timeout_s:.0f}s after casting.")
+                self.engine.save_snapshot("miss", self)
+
+
+    def _click_right(self, stage, due):
+        # Clicks and records how late the click landed relative to when it was due.
+        self.mouse_controller.click(self.right_button)
+        clicked = self.clock.monotonic()
+        self.engine.latency.record(stage, clicked - due)
+        return clicked
+
+
+    def on_feature(self, volume_norm, threshold, adc_time, confirmed=False, armed=False, confirm_delay_s=0.0):
+        # Detector thread: this session's feature for one block, the threshold to judge it by and
+        # the engine's SplashConfirmer verdict. Returns the DECISION_* code kept by the flight recorder.
+        self.splash_threshold = threshold
+        if not self.is_rod_cast or self.reel_pending:
+            return DECISION_IDLE
+
+        if self.clock.monotonic() < self.cooldown_until:
+            return DECISION_IDLE
+
+        if confirmed:
+            decided = self.clock.monotonic()
+            adc_time -= confirm_delay_s # Latencies count from the block the splash started in
+            self.splashes += 1
+            self.engine.latency.record("detection", decided - adc_time)
+            self.engine.latency.record("confirmation", confirm_delay_s)
+            self.engine.record_event("detection", self.lane, volume_norm, threshold, decided - adc_time)
+            self._update_status(f"[SOUND] Splash confirmed after {confirm_delay_s * 1000:.0f}ms! "
+                                f"Vol: {volume_norm:.4f} (Thresh: {threshold:.4f})")
+
+            if random.random() < random.uniform(self.settings.skip_splash_chance[0], self.settings.skip_splash_chance[1]):
+                self._update_status(f"[HUMANIZE] Decided to miss/skip splash.")
+                self.engine.record_event("skip", self.lane)
+                self.reel_pending = True # Ignore further blocks until the worker has handled it
+                self.engine.scheduler.call_soon(self._skip_splash)
+                return DECISION_SKIP
+
+            delay_ms = random.uniform(self.settings.click_delay_base_ms[0], self.settings.click_delay_base_ms[1])
+            if random.random() < self.settings.reaction_time_variability_factor:
+                variation = delay_ms * random.uniform(-self.settings.reaction_time_variability_factor, self.settings.reaction_time_variability_factor)
+                delay_ms += variation
+            if random.random() < self.settings.occasional_extreme_delay_chance:
+                extreme_delay = random.uniform(self.settings.extreme_delay_ms_range[0], self.settings.extreme_delay_ms_range[1])
+                delay_ms += extreme_delay
+            delay_ms = max(50, delay_ms) # Ensure delay is at least 50ms
+
+            self._update_status(f"[ACTION] Confirmed! Waiting {delay_ms:.0f}ms to reel in...")
+            # The scheduler does the waiting, so the detector keeps draining blocks meanwhile
+            self.reel_pending = True
+            reel_due = decided + delay_ms / 1000.0
+            self.engine.latency.record("reaction_delay", reel_due - decided)
+            self.engine.scheduler.call_at(reel_due, self._reel_in, adc_time, reel_due)
+            return DECISION_REEL
+        return DECISION_ARMED if armed else DECISION_LISTEN
+
+
+    def _skip_splash(self):
+        self.skips += 1
+        self.is_rod_cast = False
+        self.reel_pending = False # Only after is_rod_cast, see "Core Bot Logic" above
+        self._cast_rod_from_thread()
+
+
+    def _reel_in(self, adc_time, reel_due):
+        # Worker thread: fires once the humanized reaction delay has elapsed.
+        if self.engine.stop_event.is_set(): return
+
+        clicked = self._click_right("click_jitter", reel_due)
+        self.is_rod_cast = False
+        self.reel_pending = False # Only after is_rod_cast, see "Core Bot Logic" above
+        self.engine.latency.record("end_to_end", clicked - adc_time)
+        self.engine.record_event("reel", self.lane, latency_s=clicked - adc_time)
+        self.reels += 1
+        self._update_status("[ACTION] Reeled in!")
+        self._cast_rod_from_thread()
+
+
+class StreamSupervisor:
+    """Keeps the engine's input streams open, reopening them with backoff after a failure.
+
+    Runs on the engine's scheduler. A watchdog checks every STREAM_WATCHDOG_INTERVAL_S
+    that each stream is active and still delivering blocks, and PortAudio's finished
+    callback (a stream aborted by an error or a vanished device) triggers the same
+    reopen. Sessions and their timers carry on untouched; they just hear nothing
+    until the streams are back.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.clock = engine.clock
+        self.reconnects = 0
+        self.lost_audio_s = 0.0
+        self._streams = None # ExitStack holding the open streams
+        self._opened_at = 0.0
+        self._down_since = None # Last audio before the current outage
+        self._retry_s = STREAM_RETRY_S[0]
+
+    def start(self):
+        """Open every stream and start the watchdog. The first open is not retried: it raises."""
+        self._open()
+        self.engine.scheduler.call_later(STREAM_WATCHDOG_INTERVAL_S, self._watchdog)
+
+    def close(self):
+        if self._streams is None:
+            return
+        streams, self._streams = self._streams, None
+        try:
+            streams.close()
+        except Exception as e: # A vanished device can fail to close too
+            log_error("Closing the audio stream failed", e)
+
+    def summary(self):
+        return f"reconnects={self.reconnects} lost_audio={self.lost_audio_s:.1f}s"
+
+    def _open(self):
+        engine = self.engine
+        streams = contextlib.ExitStack()
+        try:
+            for input_index, stream in enumerate(engine.streams):
+                # Sounddevice uses device=None for the system default.
+                push = engine.pipeline.input_callback(input_index)
+                streams.enter_context(engine.backend.input_stream(
+                    engine, input_index, device=stream["device"], samplerate=engine.settings.samplerate,
+                    blocksize=engine.settings.hop_size, channels=stream["channels"],
+                    latency="low" if engine.windows else "high",
+                    callback=functools.partial(engine._audio_callback_for_thread, push),
+                    finished_callback=self._stream_finished, dtype=engine.settings.input_dtype))
+        except BaseException:
+            streams.close()
+            raise
+        self._streams = streams
+        self._opened_at = self.clock.monotonic()
+
+    def _stream_finished(self):
+        # PortAudio thread: a stream stopped. Expected when stopping, a failure otherwise.
+        if not self.engine.stop_event.is_set():
+            self.engine.scheduler.call_soon(self._lost, "stream stopped")
+
+    def _watchdog(self):
+        if self.engine.stop_event.is_set(): return
+        if self._down_since is None:
+            now = self.clock.monotonic()
+            for index, ring in enumerate(self.engine.pipeline.rings):
+                last_audio = ring.last_arrival_time()
+                if now - max(last_audio or 0.0, self._opened_at) > STREAM_STALL_S:
+                    self._lost(f"no audio from {self.engine.streams[index]['name']} for {STREAM_STALL_S:.0f}s")
+                    break
+        self.engine.scheduler.call_later(STREAM_WATCHDOG_INTERVAL_S, self._watchdog)
+
+    def _lost(self, reason):
+        if self._down_since is not None or self.engine.stop_event.is_set():
+            return # Already reopening
+        arrivals = [ring.last_arrival_time() for ring in self.engine.pipeline.rings]
+        self._down_since = min([arrival for arrival in arrivals if arrival is not None] or [self._opened_at])
+        self.engine._update_status(f"[WARNING] Audio stream lost ({reason}), reopening...")
+        self.engine.record_event("warning", detail=f"stream lost: {reason}")
+        self.close()
+        self._retry_s = STREAM_RETRY_S[0]
+        self.engine.scheduler.call_later(self._retry_s, self._reopen)
+
+    def _reopen(self):
+        if self.engine.stop_event.is_set(): return
         try:
-            device_list = sd.query_devices()
-            for i, device_info in enumerate(device_list):
-                if device_info['max_input_channels'] > 0:
-                    # Store the actual device ID (index or specific API ID if needed)
-                    # For simplicity, sounddevice often just needs the index `i`
-                    # or the string name. Using index `i` is common.
-                    devices.append({"id": i, "name": device_info['name']})
+            self.engine.backend.reset_devices() # Let PortAudio see devices plugged in since it started
+            self._open()
         except Exception as e:
-            # This might happen if PortAudio isn't found or there's a driver issue
-            print(f"Error querying audio devices: {e}")
-            # Optionally, update a status label in the GUI here if it's already set up
-        return devices
+            self._retry_s = min(self._retry_s * 2, STREAM_RETRY_S[1])
+            self.engine._update_status(f"[WARNING] Reopening the audio stream failed ({type(e).__name__}: {e}), "
+                                       f"retrying in {self._retry_s:.1f}s.")
+            self.engine.scheduler.call_later(self._retry_s, self._reopen)
+            return
+        lost_s = self.clock.monotonic() - self._down_since
+        self._down_since = None
+        self.reconnects += 1
+        self.lost_audio_s += lost_s
+        self.engine._update_status(f"[INFO] Audio stream reopened after ~{lost_s:.1f}s without audio "
+                                   f"(reconnect {self.reconnects}).")
+        self.engine.record_event("reconnect", value=lost_s)
+
+
+class LiveBackend:
+    """Real audio input and mouse on the system clock: what normal sessions use."""
+    name = "live"
+    clock = SYSTEM_CLOCK
+    inline_detection = False # The pipeline runs its own detector thread
+    shared_mouse = True # mouse_controller is the same system mouse for every lane
+
+    def __init__(self):
+        self._mouse_controller = None
+
+    @property
+    def right_button(self):
+        return mouse.Button.right
+
+    def input_stream(self, engine, input_index, **kwargs):
+        return sd.InputStream(**kwargs)
+
+    def reset_devices(self):
+        # Only safe with every stream closed. PortAudio enumerates devices once, at initialisation.
+        DEVICE_CATALOG.wait() # PortAudio calls from two threads at once are not safe
+        sd._terminate()
+        sd._initialize()
+
+    def mouse_controller(self, lane):
+        # Every session gets the one system mouse
+        if self._mouse_controller is None:
+            self._mouse_controller = mouse.Controller()
+        return self._mouse_controller
+
+
+class FishingEngine:
+    """The bot without any UI: audio streams, splash detection and the fishing sessions.
+
+    Front ends (FishingBotGUI, the --headless CLI) create one per run, call
+    `start`, show the lines pushed to `status_log`, and poll `is_running`. With
+    `settings.streams`, one engine drives several game instances: every channel
+    of every stream gets its own FishingSession, and all of them are detected in
+    one batch on a single detector thread. With `level_meter`, each run keeps
+    a LevelMeter in `meter` for a GUI to draw.
+    """
+    def __init__(self, settings, status_log=None, backend=None, level_meter=False):
+        self.settings = settings
+        self.status_log = status_log if status_log is not None else StatusLog(file_path=settings.status_log_file)
+        self.backend = backend or LiveBackend() # Audio input, mouse and clock
+        self.clock = self.backend.clock
+        self.fishing_thread = None
+        self.stop_event = threading.Event()
+
+        self.bot_start_time = 0
+        self.current_session_duration = 0
+        self.streams = [] # Resolved stream dicts, set on start
+        self.sessions = [] # One FishingSession per lane, created on start
+        self.pipeline = None # DetectionPipeline, created per run
+        self.scheduler = None # ActionScheduler driving casts, reels and mouse actions, created per run
+        self.detector = None # SplashDetector over all lanes, created per run
+        self.calibrator = None # NoiseFloorCalibrator over all lanes, created per run when auto threshold is on
+        self.confirmer = None # SplashConfirmer over all lanes, created per run
+        self._thresholds = None # Per-lane thresholds from before the current block
+        self._decisions = None # Per-lane DECISION_* codes for the current block
+        self.windows = None # One SlidingWindow per input stream when hop_ms is set
+        self._windowed = None # The current windows of all lanes side by side, with several streams
+        self.recorder = None # FlightRecorder, created per run when flight_recorder_path is set
+        self._snapshot_numbers = itertools.count(1) # Keeps snapshot names unique within a second
+        self.metrics = None # MetricsWriter, created per run when metrics_db_path is set
+        self.level_meter = level_meter
+        self.meter = None # LevelMeter, created per run when level_meter is set
+        self.supervisor = None # StreamSupervisor owning the open input streams, created per run
+        self.latency = LatencyRecorder() # Replaced at each run start, kept after stop for reporting
+        self._reported_audio_losses = (0, 0, 0)
+
+    def start(self, device=None):
+        """Set up detection and start the worker thread. Raises ValueError/OSError on bad settings."""
+        if self.settings.splash_threshold <= 0:
+            raise ValueError("Threshold must be positive.")
+        self.streams = resolve_streams(self.settings, device)
+        if (sum(stream["lanes"] for stream in self.streams) > 1 and self.backend.shared_mouse
+                and not self.settings.allow_shared_mouse):
+            raise ValueError("Several sessions would click the same mouse, i.e. whichever game has focus. "
+                             "Set allow_shared_mouse to run them anyway.")
+        self.sessions = []
+        initial_thresholds = []
+        for input_index, stream in enumerate(self.streams):
+            for channel in range(stream["lanes"]):
+                name = ""
+                if len(self.streams) > 1 or stream["lanes"] > 1:
+                    name = stream["name"] + (f"/ch{channel}" if stream["lanes"] > 1 else "")
+                lane = len(self.sessions)
+                session = FishingSession(self, lane, input_index, name, self.backend.mouse_controller(lane))
+                session.splash_threshold = stream["splash_threshold"]
+                self.sessions.append(session)
+                initial_thresholds.append(stream["splash_threshold"])
+        lanes = len(self.sessions)
+        hop_size = self.settings.detection_hop_size # Validates hop_ms and decimation
+        block_size = self.settings.detection_block_size
+        self.windows = None
+        if hop_size < block_size:
+            self.windows = [SlidingWindow(block_size, stream["lanes"]) for stream in self.streams]
+            self._windowed = np.zeros((block_size, lanes), dtype=np.float32) if len(self.streams) > 1 else None
+        self.detector = make_detector(self.settings.detector, self.settings, channels=lanes)
+        self.calibrator = (make_calibrator(self.settings, initial_thresholds, lanes=lanes)
+                           if self.settings.auto_threshold else None)
+        self.confirmer = make_confirmer(self.settings, lanes, self.detector.transient)
+        self._thresholds = np.array(initial_thresholds, dtype=np.float64)
+        self._decisions = np.zeros(lanes, dtype=np.int8)
+        self.meter = (LevelMeter(lanes, self.settings.hop_s, level_scale=1.0 / math.sqrt(self.settings.decimation))
+                      if self.level_meter else None) # The front end's gain is not part of the input level
+        self.recorder = None
+        if self.settings.flight_recorder_path:
+            self.recorder = FlightRecorder(self.settings.flight_recorder_path, hop_size, lanes,
+                                           self.settings.detection_samplerate, self.settings.flight_recorder_s)
+            self._update_status(f"[RECORDER] Keeping the last {self.settings.flight_recorder_s:.0f}s of audio in {self.settings.flight_recorder_path}")
+
+        threshold_mode = "auto, starting at" if self.calibrator else "fixed"
+        self._update_status(f"Starting bot with {threshold_mode} threshold {self.settings.splash_threshold} ({self.detector.name} detector)...")
+        self._update_status(f"[INFO] {self.confirmer.summary()}")
+        if self.windows:
+            self._update_status(f"[INFO] Low-latency mode: {self.settings.block_duration_ms} ms windows every {self.settings.hop_ms} ms.")
+        if self.settings.decimation > 1:
+            self._update_status(f"[INFO] Detecting at {self.settings.detection_samplerate:.0f} Hz "
+                                f"(decimated {self.settings.decimation}x from {self.settings.samplerate} Hz).")
+        if lanes > 1:
+            self._update_status(f"[INFO] {lanes} sessions: {', '.join(session.name for session in self.sessions)}")
+        self._update_status("Ensure Minecraft is the active window!")
+
+        self.stop_event.clear()
+        self.latency = LatencyRecorder()
+        self.scheduler = ActionScheduler(self.clock)
+        self.fishing_thread = threading.Thread(target=self._fishing_worker_thread)
+        self.fishing_thread.daemon = True
+        self.fishing_thread.start()
+
+    def stop(self):
+        self._update_status("Stopping bot signal sent...")
+        self._request_stop()
+
+    def is_running(self):
+        return self.fishing_thread is not None and self.fishing_thread.is_alive()
+
+    def join(self, timeout=None):
+        if self.fishing_thread:
+            self.fishing_thread.join(timeout=timeout)
+
+    def calibration_summary(self, lane=0):
+        if self.calibrator:
+            return self.calibrator.summary(lane)
+        threshold = self.sessions[lane].splash_threshold if self.sessions else self.settings.splash_threshold
+        return f"Noise floor: - | Threshold: {threshold:.4f} (fixed)"
+
+    def set_threshold(self, value, lane=None):
+        """Any thread: use a fixed `value` as the threshold of `lane` (all lanes when None).
+
+        Returns False, leaving the threshold alone, when auto threshold is on.
+        """
+        if self.calibrator:
+            self._update_status("[INFO] Auto threshold is on; turn off 'Auto' to set the threshold by hand.")
+            return False
+        sessions = self.sessions if lane is None else [self.sessions[lane]]
+        for session in sessions:
+            session.splash_threshold = value
+            self._thresholds[session.lane] = value # The detector thread reads it on its next block
+            self.record_event("threshold", session.lane, threshold=value)
+        self._update_status(f"[INFO] Threshold set to {value:.4f}.")
+        return True
+
+    def stats_lines(self):
+        """One line per session: calibration state and cast/reel counts, plus stream reconnects if any."""
+        if len(self.sessions) <= 1:
+            lines = [self.calibration_summary()]
+        else:
+            lines = [f"{session.stats_line()} | {self.calibration_summary(session.lane)}" for session in self.sessions]
+        if self.supervisor and self.supervisor.reconnects:
+            lines.append(f"Audio streams: {self.supervisor.summary()}")
+        return lines
+
+    def report_stats(self):
+        for line in self.stats_lines():
+            self._update_status(f"[STATS] {line}")
+
+    def flag_false_trigger(self):
+        """Any thread: the last reel was on noise, count it and snapshot the audio that caused it."""
+        if self.scheduler and self.is_running():
+            self.record_event("false_trigger")
+            self.scheduler.call_soon(self.save_snapshot, "false_trigger")
+
+    def record_event(self, kind, lane=None, value=None, threshold=None, latency_s=None, detail=None):
+        # Detector or worker thread (never the audio callback): queue it for the metrics writer.
+        if self.metrics:
+            self.metrics.record(kind, lane, value, threshold, latency_s, detail)
+
+    def save_snapshot(self, reason, session=None):
+        # Worker thread: the recorder copies the recent blocks, a background thread writes them.
+        if not self.recorder:
+            self._update_status("[RECORDER] Flight recorder is off (set flight_recorder_path to enable it).")
+            return
+        name = f"{reason}-{time.strftime('%Y%m%d-%H%M%S')}-{next(self._snapshot_numbers):03d}"
+        if session is not None and session.name:
+            name += "-" + session.name.replace("/", "-")
+        path = self.recorder.snapshot(os.path.join(self.settings.flight_snapshot_dir, name),
+                                      self.settings.flight_snapshot_s, session.lane if session else None)
+        if path:
+            self._update_status(f"[RECORDER] Saving last {self.settings.flight_snapshot_s:.0f}s to {path}")
+
+    def report_latency(self):
+        lines = self.latency.summary_lines()
+        if not lines:
+            self._update_status("[LATENCY] No latency samples recorded yet.")
+            return
+        self._update_status("[LATENCY] Stage timings (ms):")
+        for line in lines:
+            self._update_status(f"[LATENCY] {line}")
+        try:
+            self._update_status(f"[LATENCY] Exported to {self.latency.export(self.settings.latency_report_path)}")
+        except OSError as e:
+            self._update_status(f"[LATENCY] Could not write {self.settings.latency_report_path}: {e}")
+
+    def _update_status(self, message):
+        # Safe from any thread: front ends drain status_log on their own schedule.
+        self.status_log.push(message)
+
+
+    def _audio_callback_for_thread(self, push, indata, frames, time_info, status):
+        # PortAudio thread: no sleeping, clicking or Tk calls here, just hand the block off.
+        if self.stop_event.is_set():
+            raise sd.CallbackStop
+        push(indata, frames, time_info, status)
+
+
+    def _process_block(self, block, ready):
+        # Detector thread: runs once per batch pulled from the ring buffers.
+        picked_up = time.monotonic()
+        lost = (self.pipeline.input_overflows, self.pipeline.input_underflows, self.pipeline.dropped)
+        if lost != self._reported_audio_losses:
+            self._reported_audio_losses = lost
+            self._update_status(f"[WARNING] Audio stream: {self.pipeline.stats_summary()}")
+            self.record_event("warning", detail=self.pipeline.stats_summary())
+
+        # Every block feeds the calibrator, so the noise floor is tracked while waiting too
+        analysed = block
+        if self.windows and self._windowed is None:
+            analysed = self.windows[0].push(block)
+        elif self.windows:
+            analysed = self._windowed
+            for window, lanes in zip(self.windows, self.pipeline.input_lanes):
+                if ready[lanes.start]: # A lane that got no new block keeps its window as it was
+                    analysed[:, lanes] = window.push(block[:, lanes])
+        features = self.detector.process(analysed, ready) # One feature per lane, all sessions at once
+        self.latency.record("detector", time.monotonic() - picked_up)
+        if self.calibrator:
+            np.copyto(self._thresholds, self.calibrator.threshold) # Decide against the pre-block threshold
+            self.calibrator.update(features, ready)
+        confirmer = self.confirmer
+        confirmer.update(features, self._thresholds, ready, self.detector.levels) # Every block, so runs span the cooldown too
+
+        self._decisions[:] = DECISION_IDLE
+        for session in self.sessions:
+            lane = session.lane
+            if ready[lane]:
+                self._decisions[lane] = session.on_feature(
+                    features[lane], self._thresholds[lane], self.pipeline.input_adc_times[session.input_index],
+                    confirmer.confirmed[lane], confirmer.armed[lane], confirmer.confirm_delay_s[lane])
+        if self.recorder:
+            self.recorder.record(block, features, self._thresholds, self._decisions,
+                                 max(self.pipeline.input_adc_times))
+        if self.meter:
+            self.meter.update(block, features, self._thresholds)
+
+
+    def _report_stats_due(self):
+        self.report_stats()
+        self.scheduler.call_later(STATS_REPORT_INTERVAL_S, self._report_stats_due)
+
+
+    def _end_session(self):
+        self._update_status(f"[SESSION] Max duration ({self.current_session_duration/3600:.2f} hrs) reached.")
+        self._request_stop()
+
+
+    def _request_stop(self):
+        # Any thread: flags the stop and wakes the scheduler out of its wait.
+        self.stop_event.set()
+        if self.scheduler:
+            self.scheduler.stop()
+
+
+    def _on_pipeline_error(self, exc):
+        self._update_status(f"ERROR in detector thread: {type(exc).__name__} - {str(exc)}")
+        self.record_event("error", detail=f"detector: {type(exc).__name__}: {exc}")
+        log_error("Detector thread failed", exc)
+        self._request_stop()
+
+
+    def _fishing_worker_thread(self):
+        self.bot_start_time = self.clock.monotonic()
+        self.supervisor = None
+        self.metrics = None
+        if self.settings.metrics_db_path:
+            self.metrics = MetricsWriter(self.settings.metrics_db_path, self.settings, self.backend.name, self.clock)
+            self.metrics.start()
+        self.current_session_duration = random.uniform(self.settings.max_session_duration_s[0], self.settings.max_session_duration_s[1])
+        self._reported_audio_losses = (0, 0, 0)
+
+        self.pipeline = DetectionPipeline(self._process_block, on_error=self._on_pipeline_error,
+                                          block_size=self.settings.hop_size,
+                                          channels=[stream["channels"] for stream in self.streams],
+                                          capacity=self.settings.ring_capacity, latency=self.latency,
+                                          clock=self.clock, dtype=self.settings.input_dtype,
+                                          front_ends=[make_front_end(self.settings, stream["channels"], stream["downmix"])
+                                                      for stream in self.streams])
+        if not self.backend.inline_detection:
+            self.pipeline.start()
+
+        try:
+            self._update_status("Audio stream starting...")
+            self.supervisor = StreamSupervisor(self)
+            self.supervisor.start()
+            self.scheduler.call_at(self.bot_start_time + self.current_session_duration, self._end_session)
+            if len(self.sessions) > 1:
+                self.scheduler.call_later(STATS_REPORT_INTERVAL_S, self._report_stats_due)
+            for session in self.sessions:
+                session.start()
+            self.scheduler.run() # Sleeps until the next event, a detected splash or a stop
+        except Exception as e:
+            self._update_status(f"ERROR in fishing thread: {type(e).__name__} - {str(e)}")
+            self.record_event("error", detail=f"worker: {type(e).__name__}: {e}")
+            log_error("Fishing thread failed", e)
+        finally:
+            if self.supervisor:
+                self.supervisor.close()
+            self.pipeline.stop()
+            if self.recorder:
+                self.recorder.close() # Waits for pending snapshots
+            self._update_status(f"[INFO] Audio pipeline: {self.pipeline.stats_summary()}")
+            if self.supervisor:
+                self._update_status(f"[INFO] Audio streams: {self.supervisor.summary()}")
+            self._update_status(f"[INFO] {self.detector.cost_summary()}")
+            for stream, front_end in zip(self.streams, self.pipeline.front_ends):
+                if front_end:
+                    self._update_status(f"[INFO] {stream['name']} front end: "
+                                        f"{front_end.cost_per_block_us():.1f} us/block over {front_end.blocks} blocks")
+            self.report_stats()
+            self.report_latency()
+            if self.metrics:
+                self.metrics.close(self.clock.monotonic() - self.bot_start_time)
+                self._update_status(f"[INFO] Metrics: {self.metrics.written} events saved to {self.settings.metrics_db_path}")
+            self._update_status("Fishing thread has finished processing.")
+
+
+class SimulatedGame:
+    """One simulated game instance: the mouse a session clicks and the audio it hears.
+
+    A right click casts when the rod is out and reels in when it is in the water.
+    A fish bites (splashes) `bite_delay_s` after the bobber lands; reeling in
+    within `catch_window_s` of the splash catches it, otherwise it gets away and
+    another bite follows.
+    """
+    def __init__(self, clock, rng, samplerate=SAMPLERATE, bite_delay_s=SIM_BITE_DELAY_S,
+                 catch_window_s=SIM_CATCH_WINDOW_S, noise_level=SIM_NOISE_LEVEL,
+                 splash_level=SIM_SPLASH_LEVEL, splash_decay_s=SIM_SPLASH_DECAY_S):
+        self.clock = clock
+        self.rng = rng
+        self.samplerate = samplerate
+        self.bite_delay_s = bite_delay_s
+        self.catch_window_s = catch_window_s
+        self.noise_level = noise_level
+        self.splash_level = splash_level
+        self.splash_decay_s = splash_decay_s
+        self.rod_in_water = False
+        self.rod_out_s = 0.0 # Time spent with the rod out of the water, up to `_rod_changed`
+        self._rod_changed = self._created = clock.monotonic()
+        self.bite_time = math.inf
+        self._splash_time = -math.inf # Most recent splash that reached the audio
+        self._noise = None
+        self.counts = collections.Counter() # casts, catches, escapes, empty_reels, clicks, moves
+
+    # The part of pynput's mouse Controller the bot uses
+    def click(self, button, count=1):
+        now = self.clock.monotonic()
+        self._escape_until(now)
+        self.counts["clicks"] += count
+        if not self.rod_in_water:
+            self.rod_out_s += now - self._rod_changed
+        self._rod_changed = now
+        for _ in range(count):
+            if not self.rod_in_water:
+                self.rod_in_water = True
+                self.counts["casts"] += 1
+                self.bite_time = now + self.rng.uniform(*self.bite_delay_s)
+            else:
+                self.rod_in_water = False
+                self.counts["catches" if self.bite_time <= now else "empty_reels"] += 1
+                self.bite_time = math.inf
+
+    def move(self, dx, dy):
+        self.counts["moves"] += 1
+
+    def rod_out_fraction(self):
+        now = self.clock.monotonic()
+        rod_out_s = self.rod_out_s + (0.0 if self.rod_in_water else now - self._rod_changed)
+        return rod_out_s / (now - self._created) if now > self._created else 0.0
+
+    def _escape_until(self, now):
+        while self.bite_time + self.catch_window_s < now:
+            self.counts["escapes"] += 1
+            self.bite_time += self.catch_window_s + self.rng.uniform(*self.bite_delay_s)
+
+    def render(self, out, start_time):
+        """Fill `out` (one channel of a block) with what the game sounds like from `start_time`."""
+        frames = len(out)
+        self._escape_until(start_time)
+        if self.bite_time < start_time + frames / self.samplerate:
+            self._splash_time = self.bite_time
+        if self._noise is None or len(self._noise) != frames:
+            self._noise = np.zeros(frames, dtype=np.float32)
+            self._offsets = np.arange(frames) / self.samplerate
+        self.rng.standard_normal(dtype=np.float32, out=self._noise)
+        np.multiply(self._noise, self.noise_level, out=out)
+        since_splash = self._offsets + (start_time - self._splash_time)
+        if since_splash[-1] >= 0 and since_splash[0] < 10 * self.splash_decay_s:
+            envelope = np.where(since_splash >= 0, np.exp(-np.maximum(since_splash, 0) / self.splash_decay_s), 0.0)
+            out += self.splash_level * envelope * self.rng.standard_normal(frames, dtype=np.float32)
+
+
+class SimulatedInputStream:
+    """Stands in for sd.InputStream: renders the games' audio on the engine's scheduler.
+
+    Each block is delivered at the virtual time its last frame was captured and
+    detected inline, so the whole session runs on the worker thread.
+    """
+    def __init__(self, engine, games, blocksize, channels, callback, samplerate=SAMPLERATE, dtype='float32', **kwargs):
+        self.engine = engine
+        self.games = games # One per channel
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self.callback = callback
+        self._block = np.zeros((blocksize, channels), dtype=np.float32)
+        # An int16 device delivers scaled integers; rendered as float32 and converted once
+        self._device_block = np.zeros((blocksize, channels), dtype=dtype) if np.dtype(dtype) != np.float32 else None
+        self._start = 0.0
+        self._count = 0
+        self._entry = None
+
+    def __enter__(self):
+        self._start = self.engine.clock.monotonic()
+        self._schedule_next()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._entry:
+            self.engine.scheduler.cancel(self._entry)
+
+    def _schedule_next(self):
+        block_end = self._start + (self._count + 1) * self.blocksize / self.samplerate
+        self._entry = self.engine.scheduler.call_at(block_end, self._tick)
+
+    def _tick(self):
+        if self.engine.stop_event.is_set(): return
+        block_start = self._start + self._count * self.blocksize / self.samplerate
+        for channel, game in enumerate(self.games):
+            game.render(self._block[:, channel], block_start)
+        self._count += 1
+        self._schedule_next()
+        block = self._block
+        if self._device_block is not None:
+            np.clip(block, -1.0, 1.0, out=block)
+            np.multiply(block, 32767, out=self._device_block, casting="unsafe")
+            block = self._device_block
+        self.callback(block, self.blocksize, None, None)
+        self.engine.pipeline.process_pending()
+
+
+class SimulatedBackend:
+    """Virtual clock, simulated games as input and mice, and inline detection (--simulate)."""
+    name = "simulated"
+    inline_detection = True # No detector thread: blocks are processed as the stream delivers them
+    shared_mouse = False # Every lane clicks its own simulated game
+    right_button = "right"
+
+    def __init__(self, samplerate=SAMPLERATE, seed=None, **game_options):
+        self.clock = VirtualClock()
+        self.rng = np.random.default_rng(seed)
+        self.samplerate = samplerate
+        self.game_options = game_options
+        self.games = {} # lane -> SimulatedGame
+
+    def game(self, lane):
+        if lane not in self.games:
+            self.games[lane] = SimulatedGame(self.clock, self.rng, self.samplerate, **self.game_options)
+        return self.games[lane]
+
+    def input_stream(self, engine, input_index, **kwargs):
+        lanes = engine.pipeline.input_lanes[input_index]
+        games = [self.game(lane) for lane in range(lanes.start, lanes.stop)]
+        if engine.streams[input_index]["downmix"]: # One game heard on every channel
+            games *= engine.streams[input_index]["channels"]
+        return SimulatedInputStream(engine, games, **kwargs)
+
+    def mouse_controller(self, lane):
+        return self.game(lane) # Each session clicks its own game
+
+    def reset_devices(self):
+        pass
+
+
+def run_simulation(settings, seed=None):
+    """Run one whole session (max_session_duration_s) against simulated games on a virtual clock.
+
+    Prints the simulated-to-wall-clock speedup and what happened in each game.
+    """
+    random.seed(seed)
+    backend = SimulatedBackend(settings.samplerate, seed)
+    status_log = StatusLog(file_path=settings.status_log_file)
+    engine = FishingEngine(settings, status_log, backend)
+    wall_start = time.perf_counter()
+    try:
+        engine.start(settings.device)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not start the simulation: {e}", file=sys.stderr)
+        return 2
+    while engine.is_running():
+        engine.join(timeout=STATUS_FLUSH_INTERVAL_MS / 1000.0)
+        print_sim_status(status_log)
+    print_sim_status(status_log)
+    wall_s = time.perf_counter() - wall_start
+    simulated_s = backend.clock.monotonic() - engine.bot_start_time
+
+    print(f"[SIM] Simulated {simulated_s / 3600:.2f} h in {wall_s:.1f} s wall ({simulated_s / wall_s:.0f}x real time)")
+    print(f"[SIM] {engine.scheduler.events_run} scheduler events, {engine.pipeline.blocks_processed} audio blocks, "
+          f"{status_log.pushed} status lines")
+    for session in engine.sessions:
+        counts = backend.game(session.lane).counts
+        label = session.name or "game"
+        print(f"[SIM] {label}: casts {counts['casts']}, catches {counts['catches']}, escapes {counts['escapes']}, "
+              f"empty reels {counts['empty_reels']}, clicks {counts['clicks']}, mouse moves {counts['moves']}, "
+              f"rod out of the water {backend.game(session.lane).rod_out_fraction():.0%} of the time")
+        if session.is_rod_cast and not backend.game(session.lane).rod_in_water:
+            print(f"[SIM] {label}: ended waiting for a bite with the rod out of the water")
+    return 0
+
+
+def print_sim_status(status_log):
+    # Simulated sessions log far too much to read; keep the summaries and problems.
+    for message in status_log.drain():
+        if message.startswith(SIM_REPORT_PREFIXES):
+            print(message, flush=True)
+
+
+class FishingBotGUI:
+    def __init__(self, root_window, settings=None):
+        self.root = root_window
+        self.root.title("🎣 Minecraft Auto-Fisher")
+        self.root.geometry("450x600") # Adjusted size
+
+        self.settings = settings or Settings()
+        self.engine = None # FishingEngine for the current/last session
+        self.status_log = StatusLog(file_path=self.settings.status_log_file)
+        self._reported_status_drops = 0
+        self._meter_top = 0.0 # Feature value at the top of the meter, follows the recent maximum
+
+        self.audio_devices = [] # Filled in by _show_devices once DEVICE_CATALOG has enumerated them
+        self.default_device_selected = False
+        DEVICE_CATALOG.refresh() # Off the startup path: the window opens while PortAudio is queried
+        # The actual device ID for sounddevice is derived during _start_fishing_clicked
+
+        self._setup_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_closing) # Handle window close
 
 
     def _setup_widgets(self):
@@ -88,49 +2838,102 @@ class FishingBotGUI:
 
         # Audio Device Selection
         ttk.Label(control_frame, text="Audio Device:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        device_names = [f"{dev['name']} (ID: {dev['id']})" for dev in self.audio_devices]
-        if not self.audio_devices: # Check if the list itself is empty
-            device_names = ["No input devices found"]
-            self.default_device_selected = True # Assuming default will be tried by sounddevice
-        else:
-            self.default_device_selected = False
-
-        self.audio_device_dropdown = ttk.Combobox(control_frame, values=device_names, state="readonly", width=40)
-
-        if self.audio_devices:
-            self.audio_device_dropdown.current(0) # Select first device by default
-            # We don't need self.selected_device_id anymore if we directly use the combobox index
-            self.audio_device_dropdown.bind("<<ComboboxSelected>>", self._on_device_select)
-        else:
-            self.audio_device_dropdown.config(state=tk.DISABLED)
+        self.audio_device_dropdown = ttk.Combobox(control_frame, values=["Searching for input devices..."],
+                                                  state=tk.DISABLED, width=40)
+        self.audio_device_dropdown.current(0)
         self.audio_device_dropdown.grid(row=0, column=1, padx=5, pady=5, sticky=tk.EW)
 
         # Splash Threshold
         ttk.Label(control_frame, text="Splash Threshold:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
         self.threshold_entry = ttk.Entry(control_frame, width=10)
-        self.threshold_entry.insert(0, str(DEFAULT_SPLASH_THRESHOLD))
+        self.threshold_entry.insert(0, str(self.settings.splash_threshold))
         self.threshold_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
 
         # Calibration Help Button
         self.calibrate_button = ttk.Button(control_frame, text="Help Calibrate", command=self._show_calibration_help)
-        self.calibrate_button.grid(row=1, column=1, padx=(100,5), pady=5, sticky=tk.W) # Adjusted padx
+        self.calibrate_button.grid(row=1, column=1, padx=(150,5), pady=5, sticky=tk.W) # Adjusted padx
+
+        self.auto_threshold_var = tk.BooleanVar(value=self.settings.auto_threshold)
+        self.auto_threshold_check = ttk.Checkbutton(control_frame, text="Auto", variable=self.auto_threshold_var)
+        self.auto_threshold_check.grid(row=1, column=1, padx=(85,5), pady=5, sticky=tk.W)
+
+        # Detector Selection
+        ttk.Label(control_frame, text="Detector:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        self.detector_dropdown = ttk.Combobox(control_frame, values=list(DETECTORS), state="readonly", width=10)
+        self.detector_dropdown.set(self.settings.detector)
+        self.detector_dropdown.grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+
+        self.calibration_label = ttk.Label(control_frame, text="Noise floor: - | Threshold: -")
+        self.calibration_label.grid(row=3, column=0, columnspan=2, padx=5, pady=(0,5), sticky=tk.W)
+
+        # Level Meter: feature history against the threshold; click to set the threshold
+        meter_frame = ttk.Frame(self.root, padding=(10, 0))
+        meter_frame.pack(fill=tk.X)
+        self.meter_label = ttk.Label(meter_frame, text="Level: - (click the meter to set the threshold)")
+        self.meter_label.pack(anchor=tk.W)
+        self.meter_canvas = tk.Canvas(meter_frame, width=METER_WIDTH, height=METER_HEIGHT, background="black",
+                                      highlightthickness=0, cursor="crosshair")
+        self.meter_canvas.pack(anchor=tk.W, pady=(2, 0))
+        self.meter_feature_line = self.meter_canvas.create_line(0, METER_HEIGHT, 0, METER_HEIGHT, fill="lime green")
+        self.meter_threshold_line = self.meter_canvas.create_line(0, 0, 0, 0, fill="orange red", dash=(4, 2))
+        self.meter_canvas.bind("<Button-1>", self._meter_clicked)
 
         # Start and Stop Buttons
         button_frame = ttk.Frame(self.root, padding="10")
         button_frame.pack(fill=tk.X)
         self.start_button = ttk.Button(button_frame, text="Start Fishing", command=self._start_fishing_clicked)
         self.start_button.pack(side=tk.LEFT, expand=True, padx=5)
-        if not self.audio_devices and not self.default_device_selected : # Disable if no devices AND default isn't implicitly chosen
-            self.start_button.config(state=tk.DISABLED)
+        self.start_button.config(state=tk.DISABLED) # Until the device list is in
 
         self.stop_button = ttk.Button(button_frame, text="Stop Fishing", command=self._stop_fishing_clicked, state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT, expand=True, padx=5)
 
+        self.latency_button = ttk.Button(button_frame, text="Latency Report", command=self._latency_clicked)
+        self.latency_button.pack(side=tk.LEFT, expand=True, padx=5)
+
+        self.false_trigger_button = ttk.Button(button_frame, text="Flag False Trigger",
+                                               command=self._false_trigger_clicked, state=tk.DISABLED)
+        self.false_trigger_button.pack(side=tk.LEFT, expand=True, padx=5)
+
         # Status Area
         ttk.Label(self.root, text="Status:").pack(pady=(10,0), anchor=tk.W, padx=10)
         self.status_text = scrolledtext.ScrolledText(self.root, height=10, state=tk.DISABLED, wrap=tk.WORD)
         self.status_text.pack(pady=5, padx=10, fill=tk.BOTH, expand=True)
 
+        self._flush_status() # Starts the periodic flush
+        self._draw_meter() # Starts the meter refresh
+        self._wait_for_devices()
+
+
+    def _wait_for_devices(self):
+        # GUI thread, on a timer until DEVICE_CATALOG's background query is done.
+        if not DEVICE_CATALOG.ready.is_set():
+            self.root.after(STATUS_FLUSH_INTERVAL_MS, self._wait_for_devices)
+            return
+        self._show_devices(DEVICE_CATALOG.devices or [])
+
+
+    def _show_devices(self, devices):
+        self.audio_devices = devices
+        device_names = [f"{dev['name']} (ID: {dev['id']})" for dev in self.audio_devices]
+        if not self.audio_devices: # Check if the list itself is empty
+            device_names = ["No input devices found"]
+            self.default_device_selected = True # Assuming default will be tried by sounddevice
+        else:
+            self.default_device_selected = False
+
+        self.audio_device_dropdown.config(values=device_names)
+        if self.audio_devices:
+            self.audio_device_dropdown.config(state="readonly")
+            configured = [i for i, dev in enumerate(self.audio_devices) if self.settings.device in (dev['id'], dev['name'])]
+            self.audio_device_dropdown.current(configured[0] if configured else 0) # First device by default
+            # We don't need self.selected_device_id anymore if we directly use the combobox index
+            self.audio_device_dropdown.bind("<<ComboboxSelected>>", self._on_device_select)
+        else:
+            self.audio_device_dropdown.current(0)
+        if not self.engine or not self.engine.is_running():
+            self.start_button.config(state=tk.NORMAL)
+
         self._update_status("Ready. Select audio device (or use default) and click Start.")
         if not self.audio_devices:
             self._update_status("WARNING: No audio input devices explicitly detected. Sounddevice might attempt to use a system default.")
@@ -150,32 +2953,89 @@ class FishingBotGUI:
     def _show_calibration_help(self):
         self._update_status("\n--- CALIBRATION HELP ---")
         self._update_status("1. Ensure Minecraft audio is audible to your microphone.")
-        self._update_status("2. In Minecraft, cast your line and listen for fish splash sounds.")
-        self._update_status("3. While the bot is NOT running, you can temporarily add a print statement")
-        self._update_status("   in the code to see 'volume_norm' values when splashes occur.")
-        self._update_status("   (Search for '_audio_callback_for_thread' and 'volume_norm').")
-        self._update_status("4. Set 'Splash Threshold' here to slightly LOWER than typical splash values,")
+        self._update_status("2. With 'Auto' ticked, the bot measures background noise while it runs and")
+        self._update_status("   sets the threshold a safe margin above it. The live values are shown")
+        self._update_status("   under the detector choice and follow changes in background noise.")
+        self._update_status(f"3. For the first {self.settings.calibration_warmup_s:.0f}s (and with 'Auto' off) the 'Splash Threshold'")
+        self._update_status("   entered here is used. Set it slightly LOWER than typical splash values,")
         self._update_status("   but higher than consistent background noise.")
         self._update_status("   Example: If splashes are 0.08-0.15 and noise is 0.02, try 0.06.")
+        self._update_status("4. While the bot runs, the meter shows the detector value (green) against the")
+        self._update_status("   threshold (red). Click the meter at the height you want to set the threshold there.")
         self._update_status("--- END HELP ---")
 
 
+    def _latency_clicked(self):
+        if self.engine:
+            self.engine.report_latency()
+        else:
+            self._update_status("[LATENCY] No latency samples recorded yet.")
+
+
+    def _false_trigger_clicked(self):
+        self.engine.flag_false_trigger()
+
+
     def _update_status(self, message):
-        def append_text():
+        # Safe from any thread: just queues the line for the next _flush_status.
+        self.status_log.push(message)
+
+
+    def _flush_status(self):
+        # GUI thread, on a timer: one widget update per batch instead of one Tk event per message.
+        batch = self.status_log.drain()
+        dropped = self.status_log.dropped
+        if dropped != self._reported_status_drops:
+            batch.append(f"[WARNING] {dropped - self._reported_status_drops} status messages dropped (log flooded).")
+            self._reported_status_drops = dropped
+        if batch:
             self.status_text.config(state=tk.NORMAL)
-            self.status_text.insert(tk.END, message + "\n")
+            self.status_text.insert(tk.END, "\n".join(batch) + "\n")
+            line_count = int(self.status_text.index("end-1c").split(".")[0])
+            if line_count > STATUS_MAX_LINES:
+                self.status_text.delete("1.0", f"{line_count - STATUS_MAX_LINES + 1}.0")
             self.status_text.see(tk.END) # Scroll to the end
             self.status_text.config(state=tk.DISABLED)
-        if self.root and self.root.winfo_exists(): # Check if root window exists
-            self.root.after(0, append_text)
-        else:
-            print(f"Status (GUI not available): {message}")
+        self.root.after(STATUS_FLUSH_INTERVAL_MS, self._flush_status)
+
+
+    def _draw_meter(self):
+        # GUI thread, on a timer: copies the engine's LevelMeter history, never waits on the detector thread.
+        meter = self.engine.meter if self.engine else None
+        if meter is not None and meter.count >= 2:
+            peak, rms, feature, threshold = meter.history()
+            target = max(float(feature.max()), float(threshold.max())) * 1.25
+            # Grow at once, shrink slowly, so the scale does not jump around
+            self._meter_top = target if target > self._meter_top else 0.95 * self._meter_top + 0.05 * target
+            x = METER_WIDTH - (len(feature) - 1 - np.arange(len(feature))) * (METER_WIDTH / (meter.points - 1))
+            for item, values in ((self.meter_feature_line, feature), (self.meter_threshold_line, threshold)):
+                y = METER_HEIGHT * (1.0 - np.minimum(values / self._meter_top, 1.0))
+                self.meter_canvas.coords(item, *np.column_stack((x, y)).ravel().tolist())
+            decibels = 20 * np.log10(np.maximum([peak[-1], rms[-1]], 1e-9))
+            self.meter_label.config(text=f"Peak {decibels[0]:.1f} dBFS | RMS {decibels[1]:.1f} dBFS | "
+                                         f"{self.engine.detector.name} {feature[-1]:.4f} (threshold {threshold[-1]:.4f})")
+        self.root.after(METER_REFRESH_MS, self._draw_meter)
+
+
+    def _meter_clicked(self, event):
+        if self._meter_top <= 0:
+            return # Nothing drawn yet, so the click has no scale
+        value = self._meter_top * (1.0 - event.y / METER_HEIGHT)
+        if value <= 0:
+            return
+        if self.engine and self.engine.is_running() and not self.engine.set_threshold(value):
+            return
+        self.threshold_entry.config(state=tk.NORMAL)
+        self.threshold_entry.delete(0, tk.END)
+        self.threshold_entry.insert(0, f"{value:.4f}")
+        if self.engine and self.engine.is_running():
+            self.threshold_entry.config(state=tk.DISABLED)
 
 
     def _start_fishing_clicked(self):
         try:
-            self.splash_threshold = float(self.threshold_entry.get())
-            if self.splash_threshold <= 0:
+            splash_threshold = float(self.threshold_entry.get())
+            if splash_threshold <= 0:
                 raise ValueError("Threshold must be positive.")
         except ValueError:
             self._update_status("ERROR: Invalid Splash Threshold. Must be a positive number.")
@@ -196,47 +3056,62 @@ class FishingBotGUI:
         else: # No devices in list, sounddevice will attempt default
             self._update_status("No audio devices in list, sounddevice will attempt to use system default.")
 
+        session_settings = self.settings.copy(splash_threshold=splash_threshold,
+                                              detector=self.detector_dropdown.get(),
+                                              auto_threshold=self.auto_threshold_var.get(),
+                                              device=actual_device_id_for_sd)
+        self.engine = FishingEngine(session_settings, self.status_log, level_meter=True)
+        try:
+            self.engine.start(actual_device_id_for_sd)
+        except (OSError, ValueError, ImportError) as e: # ImportError: pynput cannot reach a display
+            self._update_status(f"ERROR: Could not start the bot: {e}")
+            return
 
-        self._update_status(f"Starting bot with threshold {self.splash_threshold}...")
-        self._update_status("Ensure Minecraft is the active window!")
-
-        self.stop_event.clear()
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
+        self.false_trigger_button.config(state=tk.NORMAL)
         if self.audio_devices:
             self.audio_device_dropdown.config(state=tk.DISABLED)
         self.threshold_entry.config(state=tk.DISABLED)
         self.calibrate_button.config(state=tk.DISABLED)
+        self.detector_dropdown.config(state=tk.DISABLED)
+        self.auto_threshold_check.config(state=tk.DISABLED)
+        self._poll_engine()
 
-        self.fishing_thread = threading.Thread(target=self._fishing_worker_thread, args=(actual_device_id_for_sd,))
-        self.fishing_thread.daemon = True
-        self.fishing_thread.start()
+
+    def _poll_engine(self):
+        # GUI thread, on a timer: only reads floats the detector thread writes, never waits on it.
+        self.calibration_label.config(text="\n".join(self.engine.stats_lines()))
+        if self.engine.is_running():
+            self.root.after(CALIBRATION_DISPLAY_MS, self._poll_engine)
+        else:
+            self._reset_gui_on_thread_stop()
 
 
     def _stop_fishing_clicked(self):
-        self._update_status("Stopping bot signal sent...")
-        self.stop_event.set()
-        # GUI update will be handled by _reset_gui_on_thread_stop
+        self.engine.stop()
+        # GUI update will be handled by _poll_engine once the thread has stopped
 
     def _reset_gui_on_thread_stop(self):
         """Called when the fishing thread actually stops."""
         self.start_button.config(state=tk.NORMAL if self.audio_devices or self.default_device_selected else tk.DISABLED)
         self.stop_button.config(state=tk.DISABLED)
+        self.false_trigger_button.config(state=tk.DISABLED)
         if self.audio_devices: # Only enable dropdown if there are devices
             self.audio_device_dropdown.config(state=tk.NORMAL)
         self.threshold_entry.config(state=tk.NORMAL)
         self.calibrate_button.config(state=tk.NORMAL)
+        self.detector_dropdown.config(state="readonly")
+        self.auto_threshold_check.config(state=tk.NORMAL)
 
-        if self.fishing_thread and self.fishing_thread.is_alive():
-            self.fishing_thread.join(timeout=1.0)
-        self.fishing_thread = None
+        self.engine.join(timeout=1.0)
         self._update_status("Bot stopped and thread joined.")
 
 
     def _on_closing(self):
-        if self.fishing_thread and self.fishing_thread.is_alive():
+        if self.engine and self.engine.is_running():
             self._update_status("Window closed. Attempting to stop fishing thread...")
-            self.stop_event.set()
+            self.engine.stop()
             # Give a very brief moment for the thread to react, then destroy
             # This is a balance between graceful shutdown and responsive GUI closing
             self.root.after(100, self._check_thread_and_destroy)
@@ -244,189 +3119,122 @@ class FishingBotGUI:
             self.root.destroy()
 
     def _check_thread_and_destroy(self):
-        if self.fishing_thread and self.fishing_thread.is_alive():
-             self.fishing_thread.join(timeout=0.5) # Short join attempt
+        if self.engine:
+            self.engine.join(timeout=0.5) # Short join attempt
         self.root.destroy()
 
 
-    # --- Core Bot Logic (moved into methods of the class) ---
-    def _smooth_mouse_move(self, dx, dy, steps=MOUSE_MOVE_STEPS):
-        current_x, current_y = 0, 0 # pynput's move is relative, so start from 0 for step logic
-        for i in range(1, steps + 1):
-            if self.stop_event.is_set(): return
-
-            # Calculate the target position for this step based on overall dx, dy
-            target_x_for_step = dx * (i / steps)
-            target_y_for_step = dy * (i / steps)
-
-            # Calculate the movement for this specific step
-            move_x = int(target_x_for_step - current_x)
-            move_y = int(target_y_for_step - current_y)
-
-            self.mouse_controller.move(move_x, move_y)
-            current_x += move_x
-            current_y += move_y
-            time.sleep(random.uniform(0.005, 0.015))
-
-    def _perform_mouse_action(self):
-        if random.random() < MOUSE_LOOK_AROUND_CHANCE:
-            self._update_status("[HUMANIZE] Performing a 'look around'.")
-            angle = random.uniform(0, 2 * math.pi)
-            distance = random.uniform(MOUSE_LOOK_AROUND_DIST_PX[0], MOUSE_LOOK_AROUND_DIST_PX[1])
-            dx = int(distance * math.cos(angle))
-            dy = int(distance * math.sin(angle))
-            self._smooth_mouse_move(dx, dy, steps=random.randint(10, 20))
-        else:
-            dx = random.randint(MOUSE_WIGGLE_DELTA_PX[0], MOUSE_WIGGLE_DELTA_PX[1])
-            dy = random.randint(MOUSE_WIGGLE_DELTA_PX[0], MOUSE_WIGGLE_DELTA_PX[1])
-            self._smooth_mouse_move(dx, dy, steps=random.randint(3, 7))
-        self.last_mouse_action_time = time.time()
-        self.next_mouse_action_interval = random.uniform(MOUSE_WIGGLE_INTERVAL_S[0], MOUSE_WIGGLE_INTERVAL_S[1]) * 1.0 # Ensure float
-
-    def _cast_rod_from_thread(self):
-        recast_base_wait = random.uniform(RECAST_DELAY_BASE_S[0], RECAST_DELAY_BASE_S[1])
-        self._update_status(f"[ACTION] Base wait {recast_base_wait:.2f}s to recast...")
-
-        sleep_end_time = time.time() + recast_base_wait
-        while time.time() < sleep_end_time:
-            if self.stop_event.is_set(): return
-            time.sleep(0.05)
-
-        if self.stop_event.is_set(): return
-
-        if random.random() < FUMBLE_RECAST_CHANCE:
-            fumble_type = random.choice(["miss", "double_tap", "hesitate"])
-            self._update_status(f"[HUMANIZE] Fumbling recast ({fumble_type})...")
-            extra_fumble_delay = random.uniform(FUMBLE_RECAST_EXTRA_DELAY_S[0], FUMBLE_RECAST_EXTRA_DELAY_S[1])
-
-            if fumble_type == "miss":
-                self._update_status(f"[HUMANIZE] ...missed, waiting {extra_fumble_delay:.2f}s.")
-                sleep_end_time_fumble = time.time() + extra_fumble_delay
-                while time.time() < sleep_end_time_fumble:
-                    if self.stop_event.is_set(): return
-                    time.sleep(0.05)
-                return
-
-            elif fumble_type == "double_tap":
-                self.mouse_controller.click(Button.right)
-                time.sleep(random.uniform(0.05, 0.15))
-                if self.stop_event.is_set(): return
-                self.mouse_controller.click(Button.right)
-                self._update_status(f"[HUMANIZE] ...double tapped.")
-                time.sleep(random.uniform(0.1, 0.3) + extra_fumble_delay / 2)
-
-            elif fumble_type == "hesitate":
-                self._update_status(f"[HUMANIZE] ...hesitating for {extra_fumble_delay:.2f}s.")
-                sleep_end_time_fumble = time.time() + extra_fumble_delay
-                while time.time() < sleep_end_time_fumble:
-                    if self.stop_event.is_set(): return
-                    time.sleep(0.05)
-                if self.stop_event.is_set(): return
-                self.mouse_controller.click(Button.right)
-                self._update_status(f"[ACTION] Casting (after hesitation).")
-        else:
-            self._update_status("[ACTION] Casting rod...")
-            self.mouse_controller.click(Button.right)
-
-        if not self.stop_event.is_set():
-            self.is_rod_cast = True
-            self.last_cast_time = time.time()
-            self._update_status(f"[INFO] Rod cast. Cooldown: ~{POST_CAST_COOLDOWN_S[0]:.1f}s.")
-
-
-    def _audio_callback_for_thread(self, indata, frames, time_info, status):
-        if self.stop_event.is_set():
-            raise sd.CallbackStop
-
-        if status:
-            self._update_status(f"[WARNING] Audio stream: {status}")
-        if not self.is_rod_cast:
-            return
-
-        cooldown = random.uniform(POST_CAST_COOLDOWN_S[0], POST_CAST_COOLDOWN_S[1])
-        if time.time() - self.last_cast_time < cooldown:
-            return
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Minecraft auto-fisher. Opens the GUI unless --headless, --list-devices, --replay, --simulate "
+                    "or --report is given.")
+    parser.add_argument("--config", metavar="FILE",
+                        help="JSON file overriding the default settings (keys as in SETTINGS_DEFAULTS).")
+    parser.add_argument("--headless", action="store_true", help="Run the bot without a GUI, logging to stdout.")
+    parser.add_argument("--device", help="Input device index or name (see --list-devices).")
+    parser.add_argument("--list-devices", action="store_true", help="List audio input devices and exit.")
+    parser.add_argument("--replay", nargs="+", metavar="RECORDING",
+                        help="Benchmark detection offline on .wav/.npy recordings instead of opening the GUI.")
+    parser.add_argument("--labels", metavar="FILE",
+                        help="Splash timestamps for --replay (default: <recording>.labels.txt if present).")
+    parser.add_argument("--detector", nargs="+", choices=list(DETECTORS),
+                        help="Detector to use (several may be compared with --replay).")
+    parser.add_argument("--threshold", type=float, help="Splash threshold (starting value with auto threshold).")
+    parser.add_argument("--auto-threshold", action=argparse.BooleanOptionalAction, default=None,
+                        help="Derive the threshold from the noise floor.")
+    parser.add_argument("--realtime", action="store_true", help="Pace --replay at the recording's real rate.")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Run a whole session against simulated games on a virtual clock and report the speedup.")
+    parser.add_argument("--seed", type=int, help="Random seed for --simulate.")
+    parser.add_argument("--report", action="store_true",
+                        help="Print per-session and per-config results from the metrics store and exit.")
+    parser.add_argument("--low-latency", action="store_true",
+                        help=f"Decide every {LOW_LATENCY_HOP_MS} ms on overlapping {LOW_LATENCY_BLOCK_MS} ms windows "
+                             f"with the '{LOW_LATENCY_DETECTOR}' detector.")
+    parser.add_argument("--block-ms", type=float, help="Analysis block (window) length in ms.")
+    parser.add_argument("--hop-ms", type=float, help="Device block length in ms; below --block-ms, windows overlap.")
+    parser.add_argument("--decimation", type=int,
+                        help="Low-pass and downsample the input by this factor before detection (e.g. 4).")
+    return parser.parse_args(argv)
+
+
+def load_settings(args):
+    settings = Settings.from_file(args.config) if args.config else Settings()
+    overrides = {}
+    if args.low_latency:
+        overrides.update(block_duration_ms=LOW_LATENCY_BLOCK_MS, hop_ms=LOW_LATENCY_HOP_MS,
+                         detector=LOW_LATENCY_DETECTOR)
+    if args.block_ms is not None:
+        overrides["block_duration_ms"] = args.block_ms
+    if args.hop_ms is not None:
+        overrides["hop_ms"] = args.hop_ms
+    if args.decimation is not None:
+        overrides["decimation"] = args.decimation
+    if args.device is not None:
+        overrides["device"] = int(args.device) if args.device.isdigit() else args.device
+    if args.detector:
+        overrides["detector"] = args.detector[0]
+    if args.threshold is not None:
+        overrides["splash_threshold"] = args.threshold
+    if args.auto_threshold is not None:
+        overrides["auto_threshold"] = args.auto_threshold
+    return settings.copy(**overrides)
+
+
+def print_status(status_log):
+    for message in status_log.drain():
+        print(f"{time.strftime('%H:%M:%S')} {message}", flush=True)
+
+
+def run_headless(settings):
+    """Run one session without a GUI. Status goes to stdout; SIGINT/SIGTERM stop the bot cleanly.
+
+    SIGUSR1 (where available) flags the last reel as a false trigger.
+    """
+    status_log = StatusLog(file_path=settings.status_log_file)
+    engine = FishingEngine(settings, status_log)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: engine.stop())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: engine.flag_false_trigger())
+    try:
+        engine.start(settings.device)
+    except (OSError, ValueError, ImportError) as e: # ImportError: pynput cannot reach a display (e.g. over SSH)
+        print(f"ERROR: Could not start the bot: {e}", file=sys.stderr)
+        return 2
+    while engine.is_running():
+        print_status(status_log)
+        engine.join(timeout=STATUS_FLUSH_INTERVAL_MS / 1000.0)
+    print_status(status_log)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_devices:
+        for dev in list_input_devices():
+            print(f"{dev['id']:>3}: {dev['name']}")
+        return 0
+    try:
+        settings = load_settings(args)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not load settings: {e}", file=sys.stderr)
+        return 2
+
+    if args.replay:
+        return run_benchmark(args.replay, args.detector or [settings.detector], settings, args.realtime, args.labels)
+    if args.report:
+        return print_metrics_report(settings.metrics_db_path or METRICS_DB_PATH)
+    if args.simulate:
+        return run_simulation(settings, args.seed)
+    if args.headless:
+        return run_headless(settings)
 
-        volume_norm = np.linalg.norm(indata) # indata is float32 by default from sounddevice
-        # For calibration:
-        # self._update_status(f"Debug Vol: {volume_norm:.4f}")
-
-
-        if volume_norm > self.splash_threshold:
-            self._update_status(f"[SOUND] Potential splash! Vol: {volume_norm:.4f} (Thresh: {self.splash_threshold:.4f})")
-
-            if random.random() < random.uniform(SKIP_SPLASH_CHANCE[0], SKIP_SPLASH_CHANCE[1]):
-                self._update_status(f"[HUMANIZE] Decided to miss/skip splash.")
-                self.is_rod_cast = False
-                return
-
-            delay_ms = random.uniform(CLICK_DELAY_BASE_MS[0], CLICK_DELAY_BASE_MS[1])
-            if random.random() < REACTION_TIME_VARIABILITY_FACTOR:
-                variation = delay_ms * random.uniform(-REACTION_TIME_VARIABILITY_FACTOR, REACTION_TIME_VARIABILITY_FACTOR)
-                delay_ms += variation
-            if random.random() < OCCASIONAL_EXTREME_DELAY_CHANCE:
-                extreme_delay = random.uniform(EXTREME_DELAY_MS_RANGE[0], EXTREME_DELAY_MS_RANGE[1])
-                delay_ms += extreme_delay
-            delay_ms = max(50, delay_ms) # Ensure delay is at least 50ms
-
-            self._update_status(f"[ACTION] Confirmed! Waiting {delay_ms:.0f}ms to reel in...")
-
-            sleep_end_time = time.time() + (delay_ms / 1000.0)
-            while time.time() < sleep_end_time:
-                if self.stop_event.is_set(): return
-                time.sleep(0.01)
-
-            if self.stop_event.is_set(): return
-
-            self.mouse_controller.click(Button.right)
-            self._update_status("[ACTION] Reeled in!")
-            self.is_rod_cast = False
-
-
-    def _fishing_worker_thread(self, device_id_for_sd):
-        self.bot_start_time = time.time()
-        self.current_session_duration = random.uniform(MAX_SESSION_DURATION_S[0], MAX_SESSION_DURATION_S[1])
-        self.last_mouse_action_time = time.time()
-        self.next_mouse_action_interval = random.uniform(MOUSE_WIGGLE_INTERVAL_S[0], MOUSE_WIGGLE_INTERVAL_S[1]) * 1.0 # ensure float
-        self.is_rod_cast = False
-
-        try:
-            self._update_status("Audio stream starting...")
-            # Sounddevice uses device=None for system default.
-            # If device_id_for_sd is None (because no devices were found/selected), it uses default.
-            # If device_id_for_sd is an int, it uses that specific device index.
-            with sd.InputStream(device=device_id_for_sd, samplerate=SAMPLERATE,
-                                 blocksize=BLOCK_SIZE, channels=CHANNELS,
-                                 callback=self._audio_callback_for_thread, dtype='float32'):
-                while not self.stop_event.is_set():
-                    if time.time() - self.bot_start_time > self.current_session_duration:
-                        self._update_status(f"[SESSION] Max duration ({self.current_session_duration/3600:.2f} hrs) reached.")
-                        break
-
-                    if not self.is_rod_cast:
-                        self._cast_rod_from_thread()
-                        if self.stop_event.is_set(): break
-
-                    current_time = time.time()
-                    if self.is_rod_cast and current_time - self.last_mouse_action_time >= self.next_mouse_action_interval:
-                        if not self.stop_event.is_set():
-                            self._perform_mouse_action()
-
-                    if self.stop_event.wait(0.1): # Wait for 0.1s or until event is set
-                        break
-        except Exception as e:
-            self._update_status(f"ERROR in fishing thread: {type(e).__name__} - {str(e)}")
-            with open("error.log", "a") as f:
-                f.write(f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-                f.write(traceback.format_exc())
-                f.write("--------------------------------\n")
-        finally:
-            self._update_status("Fishing thread has finished processing.")
-            if self.root and self.root.winfo_exists():
-                self.root.after(0, self._reset_gui_on_thread_stop)
+    main_root = tk.Tk()
+    app = FishingBotGUI(main_root, settings)
+    main_root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main_root = tk.Tk()
-    app = FishingBotGUI(main_root)
-    main_root.mainloop()
\ No newline at end of file
+    sys.exit(main())